@@ -0,0 +1,217 @@
+import asyncio
+import fcntl
+import hashlib
+import mmap
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Mapping, Optional
+
+class Overloaded(Exception):
+    """Raised when a request is shed; ``retry_after`` is a hint in seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+# ──────────────── Concurrency Limit ──────────────── #
+
+class AdmissionController:
+    """Caps the requests in progress; a bounded queue waits for a slot and the rest are shed.
+
+    Requests beyond ``max_concurrent`` wait in FIFO order, at most
+    ``max_queue`` of them and for at most ``queue_timeout`` seconds, so a
+    burst costs the queued requests a bounded delay rather than slowing every
+    request down. Used from the event loop only; ``max_concurrent`` of 0
+    admits everything.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        if self.max_concurrent <= 0:
+            return
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded("queue_full", max(self.queue_timeout, 1.0))
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait((waiter,), timeout=self.queue_timeout)
+        except asyncio.CancelledError:  # the client went away
+            if waiter.done():
+                self.release()  # the slot arrived meanwhile; pass it on
+            else:
+                self._abandon(waiter)
+            raise
+        if not waiter.done():
+            self._abandon(waiter)
+            self.timed_out += 1
+            raise Overloaded("queue_timeout", max(self.queue_timeout, 1.0))
+        self.admitted += 1
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        waiter.cancel()
+        self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        if self.max_concurrent <= 0:
+            return
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # hand the slot straight to the next in line
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out
+        }
+
+# ──────────────── Rate Limiting ──────────────── #
+
+class RateLimiter:
+    """Token bucket per client: ``rate`` tokens per second, holding up to ``burst``.
+
+    A request takes tokens according to its cost, so an expensive search
+    drains a bucket faster than a cheap fetch; a request costing more than
+    ``burst`` can never be afforded and is refused outright. Used from the
+    event loop only; a ``rate`` of 0 disables limiting.
+
+    Buckets live in a table of ``max_clients`` slots indexed by a hash of the
+    client key. With ``shared_path`` the table is a file mapped by every
+    gunicorn worker and updated under a file lock, so a client's limit holds
+    across workers rather than once per worker. A client whose slot is taken
+    over by another key starts again with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: float, costs: Mapping[str, float], default_cost: float = 1.0,
+                 max_clients: int = 10000, clock: Callable[[], float] = time.monotonic,
+                 shared_path: Optional[str] = None):
+        self.rate = rate
+        self.burst = burst
+        self.costs = dict(costs)
+        self.default_cost = default_cost
+        self.max_clients = max_clients
+        self.shared_path = shared_path
+        self._clock = clock  # must agree across processes when shared, as time.monotonic does
+        self._pid: Optional[int] = None
+        self._fd: Optional[int] = None
+        self.allowed = 0
+        self.limited = 0
+        self.over_budget = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def cost(self, method: str, tool: Optional[str] = None) -> float:
+        """Cost of one call; ``tools/call:<tool>`` entries override the ``tools/call`` cost."""
+        if tool is not None:
+            cost = self.costs.get(f"{method}:{tool}")
+            if cost is not None:
+                return cost
+        return self.costs.get(method, self.default_cost)
+
+    def _open(self) -> None:
+        # Mapped on first use in each process: a descriptor inherited through
+        # fork would share its lock with the parent.
+        if self._pid == os.getpid():
+            return
+        size = self.max_clients * 24
+        if self.shared_path is None:
+            self._fd, buffer = None, mmap.mmap(-1, size)
+        else:
+            self._fd = os.open(self.shared_path, os.O_RDWR | os.O_CREAT, 0o600)
+            if os.fstat(self._fd).st_size != size:
+                with self._locked():
+                    os.ftruncate(self._fd, size)
+            buffer = mmap.mmap(self._fd, size)
+        view = memoryview(buffer)
+        n = self.max_clients
+        self._keys = view[:8 * n].cast("q")  # 0 marks a free slot
+        self._tokens = view[8 * n:16 * n].cast("d")
+        self._updated = view[16 * n:].cast("d")
+        self._pid = os.getpid()
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        if self._fd is None:
+            yield
+            return
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)  # released by the kernel if the holder dies
+        try:
+            yield
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def take(self, client: str, cost: float) -> None:
+        """Charge ``cost`` tokens to ``client`` or raise Overloaded with the wait until they refill."""
+        if not self.enabled or cost <= 0:
+            return
+        if cost > self.burst:
+            self.over_budget += 1
+            raise Overloaded("over_budget", 0.0)
+        self._open()
+        key = int.from_bytes(hashlib.blake2b(client.encode(), digest_size=8).digest(), "little", signed=True) or 1
+        slot = key % self.max_clients
+        with self._locked():
+            now = self._clock()
+            if self._keys[slot] != key:
+                self._keys[slot] = key
+                tokens = self.burst
+            else:
+                tokens = min(self.burst, self._tokens[slot] + (now - self._updated[slot]) * self.rate)
+            self._updated[slot] = now
+            allowed = tokens >= cost
+            self._tokens[slot] = tokens - cost if allowed else tokens
+        if not allowed:
+            self.limited += 1
+            raise Overloaded("rate_limited", (cost - tokens) / self.rate)
+        self.allowed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        clients = 0
+        if self.enabled:
+            self._open()
+            clients = sum(1 for key in self._keys if key)
+        return {
+            "enabled": self.enabled,
+            "rate": self.rate,
+            "burst": self.burst,
+            "shared": self.shared_path is not None,
+            "clients": clients,
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "over_budget": self.over_budget
+        }
@@ -0,0 +1,250 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Replays an MCP request mix against the ASGI app in this process (no sockets)
+# and prints a JSON report: throughput, latency percentiles overall and per
+# method, memory, and micro-benchmarks of search_knowledge / fetch_knowledge.
+#
+#   python bench/replay.py --knowledge-base corpus-10k.jsonl --output report.json
+#
+# Mix files hold one JSON-RPC body per line; the string placeholders $QUERY
+# and $DOC_ID are replaced per request with a query built from a random
+# document title and a random document id.
+
+# ──────────────── Statistics ──────────────── #
+
+def percentile(ordered: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+def summarize(seconds: List[float]) -> Dict[str, float]:
+    ordered = sorted(seconds)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 4) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 4),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 4),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 4),
+        "max_ms": round(ordered[-1] * 1000, 4) if ordered else 0.0
+    }
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return peak_rss_mb()
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# ──────────────── In-Process ASGI Client ──────────────── #
+
+async def asgi_request(app: Any, method: str, path: str, body: bytes = b"",
+                       headers: Sequence[Tuple[bytes, bytes]] = ()) -> Tuple[int, bytes]:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "client": ("127.0.0.1", 0), "server": ("bench", 80),
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                    *headers]
+    }
+    delivered = False
+    disconnected = asyncio.Event()
+    status = 0
+    chunks: List[bytes] = []
+
+    async def receive() -> Dict[str, Any]:
+        nonlocal delivered
+        if not delivered:
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await disconnected.wait()  # streaming responses listen for a disconnect
+        return {"type": "http.disconnect"}
+
+    async def send(message: Dict[str, Any]) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        disconnected.set()
+    return status, b"".join(chunks)
+
+# ──────────────── Replay ──────────────── #
+
+def load_mix(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def substitute(value: Any, fill: Callable[[str], str]) -> Any:
+    if isinstance(value, str):
+        return fill(value) if "$" in value else value
+    if isinstance(value, dict):
+        return {k: substitute(v, fill) for k, v in value.items()}
+    if isinstance(value, list):
+        return [substitute(v, fill) for v in value]
+    return value
+
+def request_label(body: Dict[str, Any]) -> str:
+    if body.get("method") == "tools/call":
+        return f"tools/call:{(body.get('params') or {}).get('name')}"
+    return str(body.get("method"))
+
+def build_requests(mix: List[Dict[str, Any]], count: int, rng: random.Random,
+                   doc_ids: List[str], queries: List[str]) -> List[Tuple[str, bytes]]:
+    def fill(text: str) -> str:
+        return text.replace("$QUERY", rng.choice(queries)).replace("$DOC_ID", rng.choice(doc_ids))
+    requests = []
+    for _ in range(count):
+        body = substitute(rng.choice(mix), fill)
+        requests.append((request_label(body), json.dumps(body).encode()))
+    return requests
+
+def is_error(status: int, payload: bytes) -> bool:
+    if status >= 400:
+        return True
+    if status == 202 or not payload:
+        return False
+    return bool(json.loads(payload).get("error"))
+
+async def replay(app: Any, requests: List[Tuple[str, bytes]], concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    by_label: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index
+        while next_index < len(requests):
+            label, body = requests[next_index]
+            next_index += 1
+            started = time.perf_counter()
+            status, payload = await asgi_request(app, "POST", "/mcp", body)
+            elapsed = time.perf_counter() - started
+            latencies.append(elapsed)
+            by_label.setdefault(label, []).append(elapsed)
+            if is_error(status, payload):
+                errors[label] = errors.get(label, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    return {
+        "requests": len(requests),
+        "concurrency": concurrency,
+        "seconds": round(wall, 4),
+        "throughput_rps": round(len(requests) / wall, 2) if wall else 0.0,
+        "errors": errors,
+        "latency": summarize(latencies),
+        "by_method": {label: summarize(samples) for label, samples in sorted(by_label.items())}
+    }
+
+def micro(fn: Callable[[Any], Any], inputs: List[Any], iterations: int) -> Dict[str, float]:
+    samples = []
+    for i in range(iterations):
+        arg = inputs[i % len(inputs)]
+        started = time.perf_counter()
+        fn(arg)
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+# ──────────────── CLI ──────────────── #
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay an MCP request mix against the app in-process.")
+    parser.add_argument("--knowledge-base", help="corpus file or directory (default: built-in corpus)")
+    parser.add_argument("--requests", default=os.path.join(ROOT, "bench", "requests.jsonl"), help="request mix")
+    parser.add_argument("--count", type=int, default=2000, help="requests to replay")
+    parser.add_argument("--warmup", type=int, default=200, help="requests replayed before measuring")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--micro-iterations", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-cache", action="store_true", help="disable the tools/call result cache")
+    parser.add_argument("--index-snapshot", help="load indexes from this snapshot file")
+    parser.add_argument("--output", help="write the report here instead of stdout")
+    args = parser.parse_args()
+
+    # Settings are read once at import, so they are fixed before main is loaded.
+    os.environ["KNOWLEDGE_BASE_PATH"] = args.knowledge_base or ""
+    os.environ["MCP_INDEX_SNAPSHOT"] = args.index_snapshot or ""
+    os.environ["MCP_LOG_REQUESTS"] = "false"
+    if args.no_cache:
+        os.environ["MCP_RESULT_CACHE_SIZE"] = "0"
+
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    import main as server
+    startup = time.perf_counter() - started
+    rss_loaded = rss_mb()
+
+    snap = server.CORPUS.current
+    rng = random.Random(args.seed)
+    doc_ids = [snap.store.at(pos)["id"] for pos in rng.sample(range(len(snap.store)), min(len(snap.store), 1000))]
+    queries = []
+    for doc_id in doc_ids:
+        words = [word for word in snap.store.get(doc_id)["title"].split() if len(word) > 3] or ["payments"]
+        queries.append(" ".join(rng.sample(words, min(2, len(words)))))
+
+    mix = load_mix(args.requests)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(replay(server.app, build_requests(mix, args.warmup, rng, doc_ids, queries),
+                                   args.concurrency))
+    report_replay = loop.run_until_complete(replay(
+        server.app, build_requests(mix, args.count, rng, doc_ids, queries), args.concurrency))
+    loop.close()
+
+    report = {
+        "benchmark": "replay",
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "corpus": {"source": snap.source, "documents": len(snap.store), "version": snap.version},
+        "settings": {"requests_file": os.path.relpath(args.requests, ROOT), "seed": args.seed,
+                     "result_cache": not args.no_cache, "index_snapshot": bool(args.index_snapshot)},
+        "startup_seconds": round(startup, 4),
+        "memory_mb": {"before_load": round(rss_before, 1), "after_load": round(rss_loaded, 1),
+                      "corpus": round(rss_loaded - rss_before, 1), "peak": round(peak_rss_mb(), 1)},
+        "replay": report_replay,
+        "result_cache": server.RESULT_CACHE.stats(),
+        "micro": {
+            "search_knowledge": micro(server.search_knowledge, queries, args.micro_iterations),
+            "fetch_knowledge": micro(server.fetch_knowledge, doc_ids, args.micro_iterations)
+        }
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH = os.path.join(ROOT, "bench")
+sys.path.insert(0, BENCH)
+
+import synthetic_corpus  # noqa: E402
+
+# Runs bench/replay.py once per corpus size, each in a fresh process so memory
+# and startup numbers are not polluted by earlier runs, and writes a combined
+# JSON report. Generated corpora are cached in --data-dir and reused while the
+# size and seed stay the same.
+#
+#   python bench/run.py --sizes 1k 10k --output bench-$(git rev-parse --short HEAD).json
+
+def corpus_path(data_dir: str, size: str, seed: int) -> str:
+    path = os.path.join(data_dir, f"corpus-{size}-seed{seed}.jsonl")
+    if not os.path.exists(path):
+        count = synthetic_corpus.SIZES.get(size) or int(size)
+        started = time.perf_counter()
+        synthetic_corpus.write(f"{path}.tmp", count, seed)
+        os.replace(f"{path}.tmp", path)
+        print(f"generated {path} ({count} docs) in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return path
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the server across corpus sizes.")
+    parser.add_argument("--sizes", nargs="+", default=["builtin", "1k", "10k", "100k"],
+                        help="'builtin', 1k, 10k, 100k or a document count")
+    parser.add_argument("--data-dir", default=os.path.join(BENCH, "data"), help="where generated corpora are kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report here instead of stdout")
+    args, replay_args = parser.parse_known_args()  # anything else goes to replay.py
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    runs = []
+    for size in args.sizes:
+        command = [sys.executable, os.path.join(BENCH, "replay.py"), "--seed", str(args.seed), *replay_args]
+        if size != "builtin":
+            command += ["--knowledge-base", corpus_path(args.data_dir, size, args.seed)]
+        print(f"running {size}...", file=sys.stderr)
+        result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+        if result.returncode != 0:
+            sys.exit(f"replay failed for {size}:\n{result.stderr}")
+        run = json.loads(result.stdout)
+        run["size"] = size
+        runs.append(run)
+
+    text = json.dumps({"benchmark": "suite", "commit": runs[0]["commit"] if runs else None, "runs": runs}, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
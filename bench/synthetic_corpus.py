@@ -0,0 +1,58 @@
+import json
+import os
+import random
+import sys
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Synthetic corpora in the KNOWLEDGE_BASE schema, for benchmarking at sizes
+# the built-in corpus cannot reach. Words, categories, topics and types are
+# drawn from the built-in corpus with Zipf-like frequencies, so term and
+# facet distributions look like real data; output is deterministic per seed.
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+
+def _vocabulary() -> Tuple[List[str], List[float], List[str], List[str], List[str]]:
+    from knowledge_base import KNOWLEDGE_BASE
+    from search_index import tokenize
+    counts = Counter(term for doc in KNOWLEDGE_BASE for term in tokenize(f"{doc['title']} {doc['content']}"))
+    words = [word for word, _ in counts.most_common()]
+    weights = [1.0 / rank for rank in range(1, len(words) + 1)]
+    def facet(field: str) -> List[str]:
+        return sorted({doc["metadata"][field] for doc in KNOWLEDGE_BASE if field in doc["metadata"]})
+    return words, weights, facet("category"), facet("topic"), facet("type")
+
+def generate(count: int, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed)
+    words, weights, categories, topics, types = _vocabulary()
+
+    def sentence(length: int) -> str:
+        return " ".join(rng.choices(words, weights, k=length)).capitalize()
+
+    for i in range(count):
+        content = ". ".join(sentence(rng.randint(8, 24)) for _ in range(rng.randint(3, 10))) + "."
+        yield {
+            "id": f"doc-{i:06d}",
+            "title": sentence(rng.randint(3, 8)).title(),
+            "content": content,
+            "url": f"https://example.com/docs/{i}",
+            "metadata": {
+                "category": rng.choice(categories),
+                "topic": rng.choice(topics),
+                "type": rng.choice(types)
+            }
+        }
+
+def write(path: str, count: int, seed: int = 0) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for doc in generate(count, seed):
+            f.write(json.dumps(doc) + "\n")
+
+if __name__ == "__main__":
+    # python bench/synthetic_corpus.py 10k corpus-10k.jsonl [seed]
+    if len(sys.argv) not in (3, 4):
+        sys.exit("usage: python bench/synthetic_corpus.py <1k|10k|100k|N> <out.jsonl> [seed]")
+    size = SIZES.get(sys.argv[1]) or int(sys.argv[1])
+    write(sys.argv[2], size, int(sys.argv[3]) if len(sys.argv) == 4 else 0)
@@ -0,0 +1,128 @@
+import os
+from typing import Dict
+
+# ──────────────── Environment Helpers ──────────────── #
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name, "").strip()
+    return int(value) if value else default
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name, "").strip()
+    return float(value) if value else default
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name, "").strip().lower()
+    return value in ("1", "true", "yes", "on") if value else default
+
+def _env_costs(name: str, default: Dict[str, float]) -> Dict[str, float]:
+    """``method=cost`` pairs separated by commas, merged over ``default``."""
+    costs = dict(default)
+    for pair in os.environ.get(name, "").split(","):
+        if pair.strip():
+            method, _, cost = pair.partition("=")
+            costs[method.strip()] = float(cost)
+    return costs
+
+# ──────────────── Result Cache ──────────────── #
+
+# Max cached tools/call results; 0 disables the cache.
+RESULT_CACHE_SIZE = _env_int("MCP_RESULT_CACHE_SIZE", 1024)
+# Seconds before a cached result expires; 0 keeps entries until evicted.
+RESULT_CACHE_TTL = _env_float("MCP_RESULT_CACHE_TTL", 0.0)
+
+# ──────────────── Serialization ──────────────── #
+
+# Emit tool results as compact JSON instead of the indent=2 default.
+COMPACT_TOOL_JSON = _env_bool("MCP_COMPACT_JSON", False)
+
+# ──────────────── Batch Requests ──────────────── #
+
+# Max entries accepted in one JSON-RPC batch.
+MAX_BATCH_SIZE = _env_int("MCP_MAX_BATCH_SIZE", 50)
+# Worker threads that run CPU-heavy batch entries (tools/call) off the event loop.
+BATCH_WORKERS = _env_int("MCP_BATCH_WORKERS", 4)
+
+# ──────────────── Listings ──────────────── #
+
+# Resources returned per resources/list page.
+RESOURCES_PAGE_SIZE = _env_int("MCP_RESOURCES_PAGE_SIZE", 100)
+# Items encoded per chunk when streaming /browse and /research_resources.
+STREAM_CHUNK_SIZE = _env_int("MCP_STREAM_CHUNK_SIZE", 256)
+
+# ──────────────── Compression ──────────────── #
+
+# Compress responses with gzip, or brotli when installed, for clients that accept it.
+COMPRESSION_ENABLED = _env_bool("MCP_COMPRESSION", True)
+# Bodies smaller than this many bytes are sent uncompressed.
+COMPRESSION_MIN_SIZE = _env_int("MCP_COMPRESSION_MIN_SIZE", 1024)
+# /browse and /research_resources bodies kept per filter set and encoding; 0 disables.
+LISTING_CACHE_SIZE = _env_int("MCP_LISTING_CACHE_SIZE", 64)
+# Total bytes of listing bodies kept per worker; least recently used bodies are evicted beyond it.
+LISTING_CACHE_BYTES = _env_int("MCP_LISTING_CACHE_BYTES", 16 * 1024 * 1024)
+# Listing bodies larger than this are streamed every time instead of cached.
+LISTING_CACHE_MAX_BYTES = _env_int("MCP_LISTING_CACHE_MAX_BYTES", 1024 * 1024)
+
+# ──────────────── Streamable HTTP ──────────────── #
+
+# Answer streamable methods over SSE when the client accepts text/event-stream.
+SSE_ENABLED = _env_bool("MCP_SSE_ENABLED", True)
+# Search hits pushed per progress notification.
+SSE_CHUNK_SIZE = _env_int("MCP_SSE_CHUNK_SIZE", 5)
+
+# ──────────────── Knowledge Base ──────────────── #
+
+# JSONL/JSON file or directory to load the corpus from; unset uses knowledge_base.py.
+KNOWLEDGE_BASE_PATH = os.environ.get("KNOWLEDGE_BASE_PATH", "").strip() or None
+# Seconds between checks of KNOWLEDGE_BASE_PATH for changes; 0 disables the watcher.
+KNOWLEDGE_BASE_WATCH_INTERVAL = _env_float("KNOWLEDGE_BASE_WATCH_INTERVAL", 0.0)
+# Prebuilt index file (python index_snapshot.py build); ignored when missing or stale.
+INDEX_SNAPSHOT_PATH = os.environ.get("MCP_INDEX_SNAPSHOT", "index.snapshot").strip() or None
+# Bearer token for POST /admin/reload; the endpoint is disabled when unset.
+ADMIN_TOKEN = os.environ.get("MCP_ADMIN_TOKEN", "").strip() or None
+# Seconds between checks for a POST /admin/reload made on another worker (needs MCP_SHARED_DIR).
+RELOAD_POLL_INTERVAL = _env_float("MCP_RELOAD_POLL_INTERVAL", 1.0)
+
+# ──────────────── Sharded Search ──────────────── #
+
+# Shard processes per serving process for scatter-gather search; 0 or 1 searches in-process.
+SEARCH_SHARDS = _env_int("MCP_SEARCH_SHARDS", 0)
+# Seconds to wait for shards before answering with the shards that responded.
+SEARCH_SHARD_TIMEOUT = _env_float("MCP_SEARCH_SHARD_TIMEOUT", 2.0)
+
+# ──────────────── Server ──────────────── #
+
+# gunicorn worker processes (gunicorn.conf.py); they share one preloaded corpus.
+WORKERS = max(_env_int("MCP_WORKERS", os.cpu_count() or 1), 1)
+# Directory the workers share for /metrics and reloads; gunicorn.conf.py creates one. Empty: per process.
+SHARED_DIR = os.environ.get("MCP_SHARED_DIR", "").strip() or None
+
+# ──────────────── Admission Control ──────────────── #
+
+# Max /mcp requests in progress per worker; 0 disables the limit.
+MAX_CONCURRENT = _env_int("MCP_MAX_CONCURRENT", 16)
+# Requests allowed to wait for a slot; beyond that they are rejected with 503.
+MAX_QUEUE = _env_int("MCP_MAX_QUEUE", 64)
+# Seconds a queued request waits for a slot before it is rejected with 503.
+QUEUE_TIMEOUT = _env_float("MCP_QUEUE_TIMEOUT", 1.0)
+# Tokens per second refilled into each client's bucket; 0 disables rate limiting.
+RATE_LIMIT = _env_float("MCP_RATE_LIMIT", 0.0)
+# Bucket size: the burst a client can send after being idle.
+RATE_LIMIT_BURST = _env_float("MCP_RATE_LIMIT_BURST", 20.0)
+# Tokens per call by method or tools/call:<tool>; anything unlisted costs 1.
+RATE_LIMIT_COSTS = _env_costs("MCP_RATE_LIMIT_COSTS", {"tools/call:search": 4.0, "notifications/initialized": 0.0})
+# Key buckets on X-Client-Id instead of the peer address; only safe behind a proxy that sets it.
+TRUST_CLIENT_ID = _env_bool("MCP_TRUST_CLIENT_ID", False)
+
+# ──────────────── Observability ──────────────── #
+
+# Log one INFO line per /mcp request.
+LOG_REQUESTS = _env_bool("MCP_LOG_REQUESTS", True)
+# Fraction of blocking requests (tools/call) run under cProfile; 0 disables profiling.
+PROFILE_SAMPLE_RATE = _env_float("MCP_PROFILE_SAMPLE_RATE", 0.0)
+# Profiled requests at least this slow are reported in the log.
+PROFILE_SLOW_MS = _env_float("MCP_PROFILE_SLOW_MS", 100.0)
+# Directory that also receives a .prof file per reported request.
+PROFILE_DIR = os.environ.get("MCP_PROFILE_DIR", "").strip() or None
+# Seconds between writes of a worker's metrics to MCP_SHARED_DIR.
+METRICS_WRITE_INTERVAL = _env_float("MCP_METRICS_WRITE_INTERVAL", 5.0)
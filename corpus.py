@@ -0,0 +1,254 @@
+import fcntl
+import glob
+import hashlib
+import importlib.util
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from document_store import DocumentStore
+from facet_index import FacetIndex
+from index_snapshot import SnapshotError, load_snapshot, write_snapshot
+from search_index import SearchIndex
+from sharded_search import ShardedSearch
+
+logger = logging.getLogger("mcp-server")
+
+REQUIRED_FIELDS = ("id", "title", "content", "url", "metadata")
+
+# ──────────────── Loading ──────────────── #
+
+def _data_files(path: str) -> List[str]:
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.endswith((".jsonl", ".json")) and not name.startswith(".")
+        )
+    return [path]
+
+def _validate(doc: Any, where: str) -> Dict[str, Any]:
+    if not isinstance(doc, dict):
+        raise ValueError(f"{where}: document must be an object")
+    missing = [field for field in REQUIRED_FIELDS if field not in doc]
+    if missing:
+        raise ValueError(f"{where}: missing fields {', '.join(missing)}")
+    if "category" not in doc["metadata"]:
+        raise ValueError(f"{where}: metadata.category is required")
+    return doc
+
+def load_documents(path: str) -> List[Dict[str, Any]]:
+    """Load documents from a JSONL/JSON file, or every such file in a directory.
+
+    JSONL files hold one document per line; JSON files hold a list of
+    documents. Documents use the KNOWLEDGE_BASE schema.
+    """
+    docs: List[Dict[str, Any]] = []
+    for filename in _data_files(path):
+        with open(filename, encoding="utf-8") as f:
+            if filename.endswith(".jsonl"):
+                for lineno, line in enumerate(f, 1):
+                    if line.strip():
+                        docs.append(_validate(json.loads(line), f"{filename}:{lineno}"))
+            else:
+                for i, doc in enumerate(json.load(f)):
+                    docs.append(_validate(doc, f"{filename}[{i}]"))
+    ids = set()
+    for doc in docs:
+        if doc["id"] in ids:
+            raise ValueError(f"Duplicate document id: {doc['id']}")
+        ids.add(doc["id"])
+    return docs
+
+def source_digest(path: Optional[str]) -> str:
+    """Content hash of the corpus source, used to tell whether an index snapshot is stale."""
+    digest = hashlib.sha1()
+    files = _data_files(path) if path else [importlib.util.find_spec("knowledge_base").origin]
+    for filename in files:
+        digest.update(os.path.basename(filename).encode("utf-8") + b"\0")
+        with open(filename, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def source_mtime(path: str) -> float:
+    files = _data_files(path)
+    return max([os.path.getmtime(path)] + [os.path.getmtime(f) for f in files if os.path.exists(f)])
+
+# ──────────────── Snapshots ──────────────── #
+
+class CorpusSnapshot:
+    """Immutable bundle of a corpus and every index derived from it.
+
+    Request handlers read ``CorpusManager.current`` once and use that snapshot
+    for the whole request, so a reload never mixes old and new indexes.
+    """
+
+    __slots__ = ("store", "search_index", "facet_index", "shards", "categories", "source", "loaded_at")
+
+    def __init__(self, store: DocumentStore, search_index: SearchIndex, facet_index: FacetIndex, source: str):
+        self.store = store
+        self.search_index = search_index
+        self.facet_index = facet_index
+        self.shards: Optional[ShardedSearch] = None
+        self.categories = self.facet_index.values("category")
+        self.source = source
+        self.loaded_at = datetime.utcnow().isoformat()
+
+    @classmethod
+    def from_documents(cls, docs: Sequence[Dict[str, Any]], source: str) -> "CorpusSnapshot":
+        return cls(DocumentStore(docs), SearchIndex(docs), FacetIndex(docs), source)
+
+    @property
+    def version(self) -> str:
+        return self.store.version
+
+def build_snapshot(path: Optional[str], index_path: Optional[str] = None) -> CorpusSnapshot:
+    """Load the corpus at ``path`` (built-in corpus when None).
+
+    A prebuilt index snapshot at ``index_path`` is used when it matches the
+    source; otherwise the indexes are built in-process.
+    """
+    source = path or "knowledge_base.py"
+    if index_path:
+        try:
+            snapshot = CorpusSnapshot(*load_snapshot(index_path, source_digest(path)), source)
+            logger.info("Loaded index snapshot %s (version %s)", index_path, snapshot.version)
+            return snapshot
+        except FileNotFoundError:
+            logger.info("No index snapshot at %s; building indexes in-process", index_path)
+        except SnapshotError as e:
+            logger.warning("Ignoring index snapshot: %s; building indexes in-process", e)
+    if path:
+        return CorpusSnapshot.from_documents(load_documents(path), source)
+    from knowledge_base import KNOWLEDGE_BASE
+    return CorpusSnapshot.from_documents(KNOWLEDGE_BASE, source)
+
+def _write_index_snapshot(path: Optional[str], target: str, digest: str) -> None:
+    snapshot = build_snapshot(path)
+    write_snapshot(target, snapshot.store, snapshot.search_index, snapshot.facet_index, snapshot.source, digest)
+
+class CorpusManager:
+    """Holds the live snapshot and rebuilds it on reload.
+
+    Reloads build a complete new snapshot off to the side and then swap a
+    single reference, which is atomic for readers; a failed build leaves the
+    current snapshot in place.
+
+    With ``shared_dir``, processes reloading the same source build its
+    indexes once: the first one writes an index snapshot there and every
+    other one maps it, so a reload costs each gunicorn worker neither a build
+    nor a private copy of the indexes.
+    """
+
+    def __init__(self, path: Optional[str], index_path: Optional[str] = None,
+                 shards: int = 0, shard_timeout: float = 2.0, shared_dir: Optional[str] = None):
+        self.path = path
+        self.index_path = index_path
+        self.shared_dir = shared_dir
+        self.shard_count = shards
+        self.shard_timeout = shard_timeout
+        self._reload_lock = threading.Lock()
+        self._mtime = source_mtime(path) if path else 0.0
+        self.current = self._build()
+        self.reloads = 0
+        self.reload_failures = 0
+        self.last_reload_error: Optional[str] = None
+
+    def reload(self) -> CorpusSnapshot:
+        with self._reload_lock:
+            started = time.perf_counter()
+            try:
+                # Recorded before building so a failed build is not retried
+                # until the source changes again.
+                self._mtime = source_mtime(self.path) if self.path else 0.0
+                snapshot = self._build(reload=True)
+                if snapshot.shards is not None:
+                    snapshot.shards.start()
+            except Exception as e:
+                self.reload_failures += 1
+                self.last_reload_error = str(e)
+                logger.exception("Knowledge base reload failed; keeping version %s", self.current.version)
+                raise
+            previous, self.current = self.current, snapshot
+            if previous.shards is not None:
+                previous.shards.close()
+            self.reloads += 1
+            self.last_reload_error = None
+            logger.info("Knowledge base reloaded: version %s -> %s (%d docs, %.2fs)",
+                        previous.version, snapshot.version, len(snapshot.store), time.perf_counter() - started)
+            return snapshot
+
+    def _build(self, reload: bool = False) -> CorpusSnapshot:
+        # MCP_INDEX_SNAPSHOT holds the deployed corpus; a reload is for changed data.
+        if not reload:
+            snapshot = build_snapshot(self.path, self.index_path)
+        elif self.shared_dir:
+            snapshot = self._build_shared()
+        else:
+            snapshot = build_snapshot(self.path)
+        if self.shard_count > 1:
+            snapshot.shards = ShardedSearch(snapshot.search_index, self.shard_count, self.shard_timeout)
+        return snapshot
+
+    def _build_shared(self) -> CorpusSnapshot:
+        source = self.path or "knowledge_base.py"
+        digest = source_digest(self.path)
+        target = os.path.join(self.shared_dir, f"corpus-{digest[:16]}.snapshot")
+        lock = os.open(os.path.join(self.shared_dir, "reload.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # One process builds while the others wait for its file.
+            fcntl.lockf(lock, fcntl.LOCK_EX)
+            try:
+                snapshot = CorpusSnapshot(*load_snapshot(target, digest), source)
+                logger.info("Loaded shared index snapshot %s (version %s)", target, snapshot.version)
+                return snapshot
+            except FileNotFoundError:
+                pass
+            except SnapshotError as e:
+                logger.warning("Rebuilding shared index snapshot: %s", e)
+            # Built in a child process, so the build's garbage goes when it
+            # exits instead of staying in this process's heap.
+            with ProcessPoolExecutor(1, multiprocessing.get_context("fork")) as builder:
+                builder.submit(_write_index_snapshot, self.path, target, digest).result()
+            for stale in glob.glob(os.path.join(self.shared_dir, "corpus-*.snapshot")):
+                if stale != target:
+                    os.remove(stale)  # processes still mapping it keep their pages
+            return CorpusSnapshot(*load_snapshot(target, digest), source)
+        finally:
+            os.close(lock)
+
+    def source_changed(self) -> bool:
+        if not self.path:
+            return False
+        try:
+            return source_mtime(self.path) > self._mtime
+        except OSError:
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "source": self.current.source,
+            "version": self.current.version,
+            "loaded_at": self.current.loaded_at,
+            "reloads": self.reloads,
+            "reload_failures": self.reload_failures,
+            "last_reload_error": self.last_reload_error,
+            "shards": None if self.current.shards is None else self.current.shards.stats()
+        }
+
+# ──────────────── CLI ──────────────── #
+
+if __name__ == "__main__":
+    # python corpus.py export knowledge.jsonl -- write the built-in corpus as JSONL
+    if len(sys.argv) != 3 or sys.argv[1] != "export":
+        sys.exit("usage: python corpus.py export <path.jsonl>")
+    from knowledge_base import KNOWLEDGE_BASE
+    with open(sys.argv[2], "w", encoding="utf-8") as f:
+        for doc in KNOWLEDGE_BASE:
+            f.write(json.dumps(doc, ensure_ascii=False) + "\n")
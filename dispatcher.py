@@ -0,0 +1,175 @@
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Union
+
+from metrics import REQUEST_LATENCY, REQUESTS, TOOL_CALLS, TOOL_LATENCY
+from responses import RequestId, rpc_error, rpc_result
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional speedup
+    orjson = None
+
+logger = logging.getLogger("mcp-server")
+
+# ──────────────── Request Decoding ──────────────── #
+
+class InvalidRequest(ValueError):
+    pass
+
+class RPCError(Exception):
+    """Raised by handlers to answer with a JSON-RPC error object instead of a result."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+class RPCRequest:
+    __slots__ = ("id", "method", "params", "is_notification")
+
+    def __init__(self, id: RequestId, method: str, params: Dict[str, Any], is_notification: bool):
+        self.id = id
+        self.method = method
+        self.params = params
+        self.is_notification = is_notification
+
+def decode_body(body: bytes) -> Any:
+    try:
+        return orjson.loads(body) if orjson is not None else json.loads(body)
+    except ValueError as e:
+        raise InvalidRequest("Invalid JSON") from e
+
+def decode_request(obj: Any) -> RPCRequest:
+    """Validate one JSON-RPC request object with plain type checks."""
+    if not isinstance(obj, dict):
+        raise InvalidRequest("Request must be an object")
+    method = obj.get("method")
+    if not isinstance(method, str):
+        raise InvalidRequest("Missing method")
+    req_id = obj.get("id")
+    if req_id is not None and (isinstance(req_id, bool) or not isinstance(req_id, (str, int))):
+        raise InvalidRequest("Invalid id")
+    params = obj.get("params")
+    if params is None:
+        params = {}
+    elif not isinstance(params, dict):
+        raise InvalidRequest("Invalid params")
+    if not isinstance(obj.get("jsonrpc", "2.0"), str):
+        raise InvalidRequest("Invalid jsonrpc version")
+    return RPCRequest(req_id, method, params, "id" not in obj)
+
+# ──────────────── Dispatcher ──────────────── #
+
+MethodHandler = Callable[[RPCRequest], Union[bytes, Dict[str, Any]]]
+StreamHandler = Callable[[RPCRequest], Optional[Iterator[bytes]]]
+ToolHandler = Callable[..., Dict[str, Any]]
+
+class Dispatcher:
+    """Maps JSON-RPC method names and MCP tool names to handler callables.
+
+    Method handlers take the decoded request and return a result, either as a
+    dict or as pre-serialized JSON bytes. Tool handlers receive whatever the
+    caller passes to ``call_tool`` (here: the corpus snapshot and the call
+    arguments) and return the tool result dict. Stream handlers are optional per method and
+    yield complete JSON-RPC messages for the SSE transport, or return None to
+    fall back to the plain handler.
+    """
+
+    def __init__(self):
+        self._methods: Dict[str, MethodHandler] = {}
+        self._blocking: Set[str] = set()
+        self._streams: Dict[str, StreamHandler] = {}
+        self._tools: Dict[str, ToolHandler] = {}
+        self._tool_definitions: List[Dict[str, Any]] = []
+
+    def method(self, name: str, blocking: bool = False) -> Callable[[MethodHandler], MethodHandler]:
+        """Register a method handler; ``blocking`` marks CPU-heavy handlers that
+        batch dispatch should run off the event loop."""
+        def register(handler: MethodHandler) -> MethodHandler:
+            self._methods[name] = handler
+            if blocking:
+                self._blocking.add(name)
+            return handler
+        return register
+
+    def stream(self, name: str) -> Callable[[StreamHandler], StreamHandler]:
+        def register(handler: StreamHandler) -> StreamHandler:
+            self._streams[name] = handler
+            return handler
+        return register
+
+    def is_blocking(self, method: str) -> bool:
+        return method in self._blocking
+
+    def tool(self, name: str, description: str, input_schema: Dict[str, Any]) -> Callable[[ToolHandler], ToolHandler]:
+        def register(handler: ToolHandler) -> ToolHandler:
+            self._tools[name] = handler
+            self._tool_definitions.append({
+                "name": name,
+                "description": description,
+                "inputSchema": input_schema
+            })
+            return handler
+        return register
+
+    def tool_definitions(self) -> List[Dict[str, Any]]:
+        return list(self._tool_definitions)
+
+    def call_tool(self, name: Optional[str], *handler_args: Any) -> Dict[str, Any]:
+        handler = self._tools.get(name)
+        if handler is None:
+            # Client-supplied names are not used as labels.
+            TOOL_CALLS.inc("unknown", "error")
+            raise RPCError(-32601, f"Method not found: unknown tool {name}")
+        started = time.perf_counter()
+        status = "exception"
+        try:
+            result = handler(*handler_args)
+            status = "ok"
+            return result
+        finally:
+            TOOL_LATENCY.observe(time.perf_counter() - started, name)
+            TOOL_CALLS.inc(name, status)
+
+    def dispatch(self, req: RPCRequest) -> bytes:
+        handler = self._methods.get(req.method)
+        if handler is None:
+            REQUESTS.inc("unknown", "error")
+            return rpc_error(req.id, -32601, "Method not found")
+        started = time.perf_counter()
+        status = "exception"
+        try:
+            body = rpc_result(req.id, handler(req))
+            status = "ok"
+            return body
+        except RPCError as e:
+            status = "error"
+            return rpc_error(req.id, e.code, e.message)
+        finally:
+            REQUEST_LATENCY.observe(time.perf_counter() - started, req.method)
+            REQUESTS.inc(req.method, status)
+
+    def dispatch_stream(self, req: RPCRequest) -> Optional[Iterator[bytes]]:
+        handler = self._streams.get(req.method)
+        messages = handler(req) if handler is not None else None
+        return None if messages is None else self._guard_stream(req, messages)
+
+    def _guard_stream(self, req: RPCRequest, messages: Iterator[bytes]) -> Iterator[bytes]:
+        # Headers are already sent once streaming starts, so failures become
+        # a final JSON-RPC error message instead of an HTTP 500.
+        started = time.perf_counter()
+        status = "exception"
+        try:
+            yield from messages
+            status = "ok"
+        except RPCError as e:
+            status = "error"
+            yield rpc_error(req.id, e.code, e.message)
+        except Exception as e:
+            logger.exception("Unhandled exception in /mcp stream")
+            yield rpc_error(req.id, -32603, f"Internal error: {str(e)}")
+        finally:
+            REQUEST_LATENCY.observe(time.perf_counter() - started, req.method)
+            REQUESTS.inc(req.method, status)
@@ -0,0 +1,131 @@
+import base64
+import binascii
+import hashlib
+import json
+from array import array
+from bisect import bisect_right
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from models import FetchResult
+from packed import LazyList, SortedKeyMap, pack_into, unpack
+from responses import encode_json, encode_tool_text
+
+RESOURCE_URI_PREFIX = "knowledge://"
+
+class DocumentStore:
+    """Id-keyed view of the corpus with fetch payloads prebuilt at construction.
+
+    Documents keep their corpus order, so positions returned by the search
+    index can be resolved with ``at()``. ``version`` is a content hash used to
+    key anything derived from the corpus. Listings page through a separate
+    id-sorted ordering index so cursors stay valid across corpus updates.
+    """
+
+    def __init__(self, docs: Sequence[Dict[str, Any]]):
+        self._docs: List[Dict[str, Any]] = list(docs)
+        self._positions: Dict[str, int] = {}
+        self._fetch_results: List[FetchResult] = []
+        self._fetch_texts: List[str] = []
+        self._resource_entries: List[bytes] = []
+        self.version = hashlib.sha1(json.dumps(self._docs, sort_keys=True).encode()).hexdigest()[:16]
+
+        for pos, doc in enumerate(self._docs):
+            self._positions[doc["id"]] = pos
+            result = _fetch_result(doc)
+            self._fetch_results.append(result)
+            self._fetch_texts.append(encode_tool_text(result.model_dump()))
+            self._resource_entries.append(encode_json({
+                "uri": f"{RESOURCE_URI_PREFIX}{doc['id']}",
+                "name": doc["title"],
+                "description": doc["content"][:200] + "..." if len(doc["content"]) > 200 else doc["content"],
+                "type": "resource",
+                "mimeType": "text/plain"
+            }))
+
+        self._sorted_ids: List[str] = sorted(self._positions)
+
+    def to_snapshot(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Scalar metadata and flat buffers for an index snapshot file."""
+        sections: Dict[str, Any] = {}
+        pack_into(sections, "docs", (json.dumps(doc, ensure_ascii=False) for doc in self._docs))
+        pack_into(sections, "fetch_texts", self._fetch_texts)
+        pack_into(sections, "resource_entries", self._resource_entries)
+        pack_into(sections, "sorted_ids", self._sorted_ids)
+        sections["sorted_positions"] = array("i", (self._positions[doc_id] for doc_id in self._sorted_ids))
+        return {"version": self.version}, sections
+
+    @classmethod
+    def from_snapshot(cls, meta: Dict[str, Any], sections: Dict[str, memoryview]) -> "DocumentStore":
+        """Rebuild a store over snapshot buffers; documents are decoded on access."""
+        store = cls.__new__(cls)
+        store.version = meta["version"]
+        store._docs = unpack(sections, "docs", "json")
+        store._sorted_ids = unpack(sections, "sorted_ids")
+        store._positions = SortedKeyMap(store._sorted_ids, sections["sorted_positions"].cast("i"))
+        store._fetch_texts = unpack(sections, "fetch_texts")
+        store._resource_entries = unpack(sections, "resource_entries", "bytes")
+        store._fetch_results = LazyList(len(store._docs), lambda pos: _fetch_result(store._docs[pos]))
+        return store
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._docs)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._positions
+
+    def at(self, pos: int) -> Dict[str, Any]:
+        return self._docs[pos]
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        pos = self._positions.get(doc_id)
+        return None if pos is None else self._docs[pos]
+
+    def fetch(self, doc_id: str) -> Optional[FetchResult]:
+        pos = self._positions.get(doc_id)
+        return None if pos is None else self._fetch_results[pos]
+
+    def fetch_text(self, doc_id: str) -> Optional[str]:
+        """Serialized fetch payload, as returned by the fetch tool."""
+        pos = self._positions.get(doc_id)
+        return None if pos is None else self._fetch_texts[pos]
+
+    def resource_entry(self, pos: int) -> bytes:
+        """Pre-serialized resources/list entry for the document at ``pos``."""
+        return self._resource_entries[pos]
+
+    def page(self, cursor: Optional[str], limit: int) -> Tuple[List[int], Optional[str]]:
+        """Return positions for the page after ``cursor`` and the next cursor, if any."""
+        start = 0
+        if cursor:
+            start = bisect_right(self._sorted_ids, decode_cursor(cursor))
+        ids = self._sorted_ids[start:start + limit]
+        next_cursor = encode_cursor(ids[-1]) if ids and start + limit < len(self._sorted_ids) else None
+        return [self._positions[doc_id] for doc_id in ids], next_cursor
+
+    def resolve_uri(self, uri: str) -> Optional[FetchResult]:
+        if not uri.startswith(RESOURCE_URI_PREFIX):
+            return None
+        return self.fetch(uri[len(RESOURCE_URI_PREFIX):])
+
+def _fetch_result(doc: Dict[str, Any]) -> FetchResult:
+    return FetchResult(
+        id=doc["id"],
+        title=doc["title"],
+        text=doc["content"],
+        url=doc["url"],
+        metadata=dict(doc.get("metadata", {}))
+    )
+
+# ──────────────── Cursors ──────────────── #
+
+def encode_cursor(doc_id: str) -> str:
+    return base64.urlsafe_b64encode(doc_id.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.b64decode(cursor.encode("ascii"), altchars=b"-_", validate=True).decode("utf-8")
+    except (binascii.Error, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
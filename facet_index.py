@@ -0,0 +1,116 @@
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+FACET_FIELDS = ("category", "topic", "type")
+
+FacetFilters = Mapping[str, Union[str, Sequence[str]]]
+
+class FacetIndex:
+    """Bitmap index over the metadata facets of the corpus.
+
+    Each facet value maps to an int bitset with bit ``i`` set for the document
+    at corpus position ``i``. Filters combine values with OR within a field and
+    AND across fields, which Python does word-at-a-time on the bitsets.
+    Facet counts over a set of matches use a per-document value code instead,
+    so they cost time proportional to the matches rather than to the corpus.
+    """
+
+    def __init__(self, docs: Sequence[Dict[str, Any]]):
+        self.doc_count = len(docs)
+        self._nbytes = (self.doc_count + 7) // 8
+        positions: Dict[str, Dict[str, List[int]]] = {field: {} for field in FACET_FIELDS}
+        for pos, doc in enumerate(docs):
+            metadata = doc.get("metadata", {})
+            for field in FACET_FIELDS:
+                value = metadata.get(field)
+                if value is not None:
+                    positions[field].setdefault(value, []).append(pos)
+        self.bitmaps: Dict[str, Dict[str, int]] = {
+            field: {value: self.to_mask(pos_list) for value, pos_list in values.items()}
+            for field, values in positions.items()
+        }
+        self._codes: Dict[str, np.ndarray] = {}
+
+    def to_snapshot(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Scalar metadata and flat buffers for an index snapshot file."""
+        return {"doc_count": self.doc_count, "bitmaps": self.bitmaps}, {}
+
+    @classmethod
+    def from_snapshot(cls, meta: Dict[str, Any], sections: Dict[str, memoryview]) -> "FacetIndex":
+        index = cls.__new__(cls)
+        index.doc_count = meta["doc_count"]
+        index._nbytes = (index.doc_count + 7) // 8
+        index.bitmaps = meta["bitmaps"]
+        index._codes = {}
+        return index
+
+    def values(self, field: str) -> List[str]:
+        return list(self.bitmaps[field])
+
+    def to_mask(self, positions: Iterable[int]) -> int:
+        members = np.zeros(self.doc_count, dtype=bool)
+        members[np.fromiter(positions, dtype=np.int64)] = True
+        return int.from_bytes(np.packbits(members, bitorder="little").tobytes(), "little")
+
+    def mask(self, filters: Optional[FacetFilters]) -> Optional[int]:
+        """Bitset of documents matching ``filters``, or None when nothing is filtered."""
+        if not filters:
+            return None
+        result = -1
+        for field, wanted in filters.items():
+            if field not in self.bitmaps:
+                raise ValueError(f"Unknown facet: {field}")
+            if isinstance(wanted, str):
+                wanted = [wanted]
+            field_mask = 0
+            for value in wanted:
+                field_mask |= self.bitmaps[field].get(value, 0)
+            result &= field_mask
+        return result
+
+    def member_table(self, mask: int) -> np.ndarray:
+        """Per-document 0/1 table for ``mask``, for O(1) membership checks while scoring.
+
+        Expanding the bitset is one vectorized pass over ``doc_count / 8``
+        bytes (about 40µs at 100k documents), done once per filtered search;
+        it buys a constant-time check per scored posting, which a sparse
+        position list would not give.
+        """
+        packed = np.frombuffer(mask.to_bytes(self._nbytes, "little"), dtype=np.uint8)
+        return np.unpackbits(packed, count=self.doc_count, bitorder="little")
+
+    def positions(self, mask: Optional[int]) -> List[int]:
+        if mask is None:
+            return list(range(self.doc_count))
+        return np.flatnonzero(self.member_table(mask)).tolist()
+
+    def _value_codes(self, field: str) -> np.ndarray:
+        # Index into the field's values per document, -1 for none; built on first use.
+        codes = self._codes.get(field)
+        if codes is None:
+            codes = np.full(self.doc_count, -1, dtype=np.int32)
+            for i, bits in enumerate(self.bitmaps[field].values()):
+                codes[self.member_table(bits).astype(bool)] = i
+            self._codes[field] = codes
+        return codes
+
+    def match_counts(self, positions: np.ndarray) -> Dict[str, Dict[str, int]]:
+        """Like ``counts`` over the documents at ``positions``, in time proportional to their number."""
+        counts: Dict[str, Dict[str, int]] = {}
+        for field, values in self.bitmaps.items():
+            codes = self._value_codes(field)[positions]
+            tally = np.bincount(codes[codes >= 0], minlength=len(values)).tolist()
+            counts[field] = {value: count for value, count in zip(values, tally) if count}
+        return counts
+
+    def counts(self, mask: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """Non-zero document counts per facet value, restricted to ``mask`` when given."""
+        counts: Dict[str, Dict[str, int]] = {}
+        for field, values in self.bitmaps.items():
+            field_counts = counts[field] = {}
+            for value, bits in values.items():
+                count = (bits if mask is None else bits & mask).bit_count()
+                if count:
+                    field_counts[value] = count
+        return counts
@@ -0,0 +1,42 @@
+import gc
+import glob
+import os
+import shutil
+import tempfile
+
+# Set before config is imported, so the preloaded app and every worker see it.
+_created_shared_dir = not os.environ.get("MCP_SHARED_DIR", "").strip()
+if _created_shared_dir:
+    os.environ["MCP_SHARED_DIR"] = tempfile.mkdtemp(prefix="mcp-server-")
+
+from config import SHARED_DIR, WORKERS  # noqa: E402
+
+# Production server: gunicorn -c gunicorn.conf.py main:app
+#
+# The app, and with it the corpus and every index, is imported once in the
+# master and inherited by the forked workers, so N workers share one copy of
+# the read-only data through copy-on-write pages (and the page cache, for a
+# memory-mapped index snapshot) instead of each building their own.
+
+bind = "0.0.0.0:8000"
+workers = WORKERS
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+def on_starting(server):
+    # Counters left by an earlier run would be added to this one's, an old
+    # reload trigger would make the new workers reload, and old rate-limit
+    # buckets and reload snapshots would carry over.
+    for pattern in ("metrics-*.json", "reload", "ratelimit", "corpus-*.snapshot"):
+        for path in glob.glob(os.path.join(SHARED_DIR, pattern)):
+            os.remove(path)
+
+def on_exit(server):
+    if _created_shared_dir:
+        shutil.rmtree(SHARED_DIR, ignore_errors=True)
+
+def pre_fork(server, worker):
+    # Move everything allocated so far into the permanent generation so the
+    # workers' garbage collector never traverses, and so never dirties, the
+    # shared pages.
+    gc.freeze()
@@ -0,0 +1,138 @@
+import hashlib
+import marshal
+import mmap
+import os
+import sys
+from typing import Any, Dict, Tuple
+
+import config
+from document_store import DocumentStore
+from facet_index import FacetIndex
+from search_index import SearchIndex
+
+# On-disk layout: MAGIC, an 8-byte little-endian header length, a marshal'd
+# header, then 8-byte aligned raw sections. The header records where each
+# section lives; sections are mapped read-only and handed to the components as
+# memoryviews, so loading costs a header decode rather than an index build.
+
+MAGIC = b"MCPIDX\x00\x00"
+SNAPSHOT_FORMAT = 1
+_ALIGN = 8
+
+_COMPONENTS = {"store": DocumentStore, "search": SearchIndex, "facets": FacetIndex}
+
+class SnapshotError(ValueError):
+    """The snapshot file is unreadable or was built from a different corpus or build."""
+
+_CODE_MODULES = ("document_store", "facet_index", "search_index", "term_dictionary",
+                 "packed", "responses")
+
+def code_digest() -> str:
+    """Hash of the code and settings that shape the snapshot contents.
+
+    A snapshot written by different indexing code, or with a different
+    MCP_COMPACT_JSON setting baked into its fetch payloads, is treated as stale
+    even when the corpus itself is unchanged.
+    """
+    digest = hashlib.sha1(repr(config.COMPACT_TOOL_JSON).encode())
+    for filename in [__file__] + [sys.modules[name].__file__ for name in _CODE_MODULES]:
+        with open(filename, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def _padding(offset: int) -> int:
+    return -offset % _ALIGN
+
+def write_snapshot(path: str, store: DocumentStore, search_index: SearchIndex, facet_index: FacetIndex,
+                   source: str, source_digest: str) -> int:
+    """Write the components to ``path`` atomically and return the file size."""
+    meta: Dict[str, Any] = {}
+    buffers: Dict[str, memoryview] = {}
+    for name, component in (("store", store), ("search", search_index), ("facets", facet_index)):
+        meta[name], sections = component.to_snapshot()
+        for section, buffer in sections.items():
+            buffers[f"{name}.{section}"] = memoryview(buffer).cast("B")
+
+    layout: Dict[str, Tuple[int, int]] = {}
+    offset = 0
+    for name, buffer in buffers.items():
+        layout[name] = (offset, len(buffer))
+        offset += len(buffer) + _padding(len(buffer))
+    header = marshal.dumps({
+        "format": SNAPSHOT_FORMAT,
+        "byteorder": sys.byteorder,
+        "code_digest": code_digest(),
+        "source": source,
+        "source_digest": source_digest,
+        "meta": meta,
+        "sections": layout
+    })
+    data_start = len(MAGIC) + 8 + len(header)
+    data_start += _padding(data_start)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        f.write(b"\0" * (data_start - f.tell()))
+        for buffer in buffers.values():
+            f.write(buffer)
+            f.write(b"\0" * _padding(len(buffer)))
+        size = f.tell()
+    os.replace(tmp_path, path)
+    return size
+
+def load_snapshot(path: str, source_digest: str) -> Tuple[DocumentStore, SearchIndex, FacetIndex]:
+    """Map ``path`` and rebuild the components over it without copying.
+
+    Raises FileNotFoundError when there is no snapshot and SnapshotError when
+    it does not match ``source_digest`` or this build.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise SnapshotError(f"{path}: not an index snapshot")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    header_len = int.from_bytes(view[len(MAGIC):len(MAGIC) + 8], "little")
+    data_start = len(MAGIC) + 8 + header_len
+    try:
+        header = marshal.loads(view[len(MAGIC) + 8:data_start])
+    except (EOFError, ValueError, TypeError) as e:
+        raise SnapshotError(f"{path}: corrupt header") from e
+    data_start += _padding(data_start)
+
+    if header.get("format") != SNAPSHOT_FORMAT or header.get("byteorder") != sys.byteorder:
+        raise SnapshotError(f"{path}: incompatible snapshot format")
+    if header.get("code_digest") != code_digest():
+        raise SnapshotError(f"{path}: built by a different version of the indexing code")
+    if header.get("source_digest") != source_digest:
+        raise SnapshotError(f"{path}: built from a different corpus ({header.get('source')})")
+
+    sections: Dict[str, Dict[str, memoryview]] = {name: {} for name in _COMPONENTS}
+    for name, (offset, length) in header["sections"].items():
+        component, section = name.split(".", 1)
+        start = data_start + offset
+        if start + length > len(view):
+            raise SnapshotError(f"{path}: truncated")
+        sections[component][section] = view[start:start + length]
+    return tuple(cls.from_snapshot(header["meta"][name], sections[name]) for name, cls in _COMPONENTS.items())
+
+# ──────────────── CLI ──────────────── #
+
+if __name__ == "__main__":
+    # python index_snapshot.py build [output] -- index the configured corpus ahead of time
+    if len(sys.argv) not in (2, 3) or sys.argv[1] != "build":
+        sys.exit("usage: python index_snapshot.py build [output]")
+    import time
+    from corpus import build_snapshot, source_digest
+
+    output = sys.argv[2] if len(sys.argv) == 3 else config.INDEX_SNAPSHOT_PATH
+    if not output:
+        sys.exit("no output path: pass one or set MCP_INDEX_SNAPSHOT")
+    started = time.perf_counter()
+    snap = build_snapshot(config.KNOWLEDGE_BASE_PATH)
+    size = write_snapshot(output, snap.store, snap.search_index, snap.facet_index,
+                          snap.source, source_digest(config.KNOWLEDGE_BASE_PATH))
+    print(f"wrote {output}: {len(snap.store)} docs, version {snap.version}, "
+          f"{size} bytes in {time.perf_counter() - started:.2f}s")
@@ -1,9 +1,16 @@
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional, Union
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import itertools
+import math
+import os
+import time
 import uvicorn
 import logging
 import json
@@ -30,79 +37,418 @@ logger = logging.getLogger("mcp-server")
 
 # ──────────────── Knowledge Base ──────────────── #
 
-from knowledge_base import KNOWLEDGE_BASE
-
-# ──────────────── Models ──────────────── #
-
-class MCPRequest(BaseModel):
-    jsonrpc: str = "2.0"
-    id: Optional[Union[str, int]] = None
-    method: str
-    params: Optional[Dict[str, Any]] = None
-
-class MCPResponse(BaseModel):
-    jsonrpc: str = "2.0"
-    id: Optional[Union[str, int]] = None
-    result: Optional[Dict[str, Any]] = None
-    error: Optional[Dict[str, Any]] = None
-
-class SearchResult(BaseModel):
-    id: str
-    title: str
-    text: str
-    url: str
-
-class FetchResult(BaseModel):
-    id: str
-    title: str
-    text: str
-    url: str
-    metadata: Optional[Dict[str, Any]] = None
+import config
+from admission import AdmissionController, Overloaded, RateLimiter
+from compression import CompressionMiddleware, compress_stream, etag_matches, negotiate
+from corpus import CorpusManager, CorpusSnapshot
+from facet_index import FACET_FIELDS, FacetFilters, FacetIndex
+from dispatcher import Dispatcher, InvalidRequest, RPCError, RPCRequest, decode_body, decode_request
+from document_store import DocumentStore
+from models import SearchResult, FetchResult
+from responses import (
+    encode_json, encode_tool_text, iter_json_array, json_bytes_response,
+    rpc_error, rpc_notification, rpc_result, sse_event
+)
+from metrics import INVALID_REQUESTS, REGISTRY, SEARCH_PHASES, SharedMetrics, SlowRequestProfiler
+from result_cache import ResultCache
+from search_index import SEARCH_MODES, SearchHit
+
+CORPUS = CorpusManager(config.KNOWLEDGE_BASE_PATH, config.INDEX_SNAPSHOT_PATH,
+                       config.SEARCH_SHARDS, config.SEARCH_SHARD_TIMEOUT, config.SHARED_DIR)
+RESULT_CACHE = ResultCache(config.RESULT_CACHE_SIZE, config.RESULT_CACHE_TTL)
+# Runs blocking methods (tools/call) off the event loop.
+BLOCKING_EXECUTOR = ThreadPoolExecutor(max_workers=config.BATCH_WORKERS, thread_name_prefix="mcp-blocking")
+PROFILER = SlowRequestProfiler(config.PROFILE_SAMPLE_RATE, config.PROFILE_SLOW_MS / 1000, config.PROFILE_DIR)
+ADMISSION = AdmissionController(config.MAX_CONCURRENT, config.MAX_QUEUE, config.QUEUE_TIMEOUT)
+# Buckets are shared by the gunicorn workers, so a client's limit does not multiply with them.
+RATE_LIMITER = RateLimiter(config.RATE_LIMIT, config.RATE_LIMIT_BURST, config.RATE_LIMIT_COSTS,
+                           shared_path=os.path.join(config.SHARED_DIR, "ratelimit") if config.SHARED_DIR else None)
+# Finished /browse and /research_resources bodies, per filter set and encoding.
+LISTING_CACHE = ResultCache(config.LISTING_CACHE_SIZE, maxbytes=config.LISTING_CACHE_BYTES)
+for cache in (RESULT_CACHE, LISTING_CACHE):
+    cache.retain(CORPUS.current.version)
+
+if config.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, minimum_size=config.COMPRESSION_MIN_SIZE)
 
 # ──────────────── Search Logic ──────────────── #
 
-def search_knowledge(query: str, limit: int = 10) -> List[SearchResult]:
-    query_lower = query.lower()
-    results = []
-
-    for doc in KNOWLEDGE_BASE:
-        score = 0
-        title = doc["title"].lower()
-        content = doc["content"].lower()
-
-        if query_lower in title:
-            score += 10
-        if query_lower in content:
-            score += 5
-        if query_lower in doc["metadata"].get("topic", "").lower():
-            score += 3
-        if score == 0:
-            continue
-
-        snippet = next((s for s in content.split('. ') if query_lower in s), content.split('. ')[0])
-        snippet = snippet.strip()[:300] + "..." if len(snippet) > 300 else snippet
+def to_search_result(snap: CorpusSnapshot, hit: SearchHit) -> SearchResult:
+    record = snap.search_index.records[hit.doc_pos]
+    return SearchResult(
+        id=record.id,
+        title=record.title,
+        text=snap.search_index.snippet(hit),
+        url=record.url
+    )
+
+def search_knowledge(query: str, limit: int = 10, mode: str = "bm25",
+                     filters: Optional[FacetFilters] = None) -> List[SearchResult]:
+    snap = CORPUS.current
+    hits, _matches, _failed_shards = search_hits(snap, query, limit, mode, filters)
+    return [to_search_result(snap, hit) for hit in hits]
+
+def search_hits(snap: CorpusSnapshot, query: str, limit: int = 10, mode: str = "bm25",
+                filters: Optional[FacetFilters] = None) -> Tuple[List[SearchHit], Any, int]:
+    """Ranked hits, positions of all matches, and how many search shards failed to answer."""
+    started = time.perf_counter()
+    allowed = search_allowed(snap, filters)
+    if snap.shards is not None:
+        sharded = snap.shards.search(query, limit, mode, allowed)
+        result = (sharded.hits, sharded.matches, sharded.failed_shards)
+    else:
+        result = (*snap.search_index.search_matches(query, limit, mode, allowed), 0)
+    SEARCH_PHASES.observe(time.perf_counter() - started, "scoring")
+    return result
+
+def search_allowed(snap: CorpusSnapshot, filters: Optional[FacetFilters]) -> Optional[Any]:
+    mask = snap.facet_index.mask(filters)
+    return None if mask is None else snap.facet_index.member_table(mask)
 
-        results.append(SearchResult(
-            id=doc["id"],
-            title=doc["title"],
-            text=snippet,
-            url=doc["url"]
-        ))
+def fetch_knowledge(doc_id: str) -> Optional[FetchResult]:
+    return CORPUS.current.store.fetch(doc_id)
+
+# ──────────────── Tool Calls ──────────────── #
+
+rpc = Dispatcher()
+
+@rpc.tool("search", "Search through ConnexPay and FinTech knowledge base.", {
+    "type": "object", "properties": {
+        "query": {"type": "string", "description": "Search query string"},
+        "limit": {"type": "integer", "minimum": 1, "maximum": 50, "default": 10,
+                  "description": "Maximum number of results"},
+        "mode": {"type": "string", "enum": list(SEARCH_MODES), "default": "bm25",
+                 "description": "Ranking mode: bm25 keyword ranking or tfidf vector similarity"},
+        "filters": {"type": "object", "description": "Restrict results to facet values, e.g. {\"category\": \"FinTech\"}",
+                    "properties": {field: {"type": ["string", "array"], "items": {"type": "string"}}
+                                   for field in FACET_FIELDS},
+                    "additionalProperties": False},
+        "facets": {"type": "boolean", "description": "Include per-facet counts over all matching documents"}
+    }, "required": ["query"]
+})
+def search_tool(snap: CorpusSnapshot, args: Dict[str, Any]) -> Dict[str, Any]:
+    hits, matches, failed_shards = search_hits(snap, search_query(args), search_limit(args),
+                                               search_mode(args), search_filters(args))
+    started = time.perf_counter()
+    results = [to_search_result(snap, hit) for hit in hits]
+    rendered = time.perf_counter()
+    result = search_tool_result(snap, results, args, matches, failed_shards)
+    SEARCH_PHASES.observe(rendered - started, "snippets")
+    SEARCH_PHASES.observe(time.perf_counter() - rendered, "serialization")
+    return result
+
+def search_query(args: Dict[str, Any]) -> str:
+    query = args.get("query", "")
+    if not isinstance(query, str) or not query.strip():
+        raise RPCError(-32602, "Missing search query")
+    return query.strip()
+
+def search_limit(args: Dict[str, Any]) -> int:
+    limit = args.get("limit", 10)
+    if not isinstance(limit, int) or isinstance(limit, bool) or not 1 <= limit <= 50:
+        raise RPCError(-32602, "Limit must be an integer between 1 and 50")
+    return limit
+
+def search_mode(args: Dict[str, Any]) -> str:
+    mode = args.get("mode") or "bm25"
+    if mode not in SEARCH_MODES:
+        raise RPCError(-32602, f"Unknown search mode: {mode}")
+    return mode
+
+def search_filters(args: Dict[str, Any]) -> Optional[FacetFilters]:
+    filters = args.get("filters")
+    if filters is None:
+        return None
+    if not isinstance(filters, dict):
+        raise RPCError(-32602, "Search filters must be an object")
+    for field, wanted in filters.items():
+        if field not in FACET_FIELDS:
+            raise RPCError(-32602, f"Unknown facet: {field}")
+        if not isinstance(wanted, str) and not (
+                isinstance(wanted, list) and all(isinstance(value, str) for value in wanted)):
+            raise RPCError(-32602, f"Facet {field} must be a string or a list of strings")
+    return filters
+
+def search_tool_result(snap: CorpusSnapshot, results: List[SearchResult], args: Dict[str, Any],
+                       matches: Any, failed_shards: int = 0) -> Dict[str, Any]:
+    result = {"content": [{
+        "type": "text",
+        "text": encode_tool_text([r.dict() for r in results])
+    }]}
+    if args.get("facets"):
+        result["facets"] = snap.facet_index.match_counts(matches)
+    if failed_shards:
+        result["partial"] = {"shards": snap.shards.shard_count, "failed": failed_shards}
+    return result
+
+@rpc.tool("fetch", "Fetch full article by ID.", {
+    "type": "object", "properties": {
+        "id": {"type": "string", "description": "Document ID to fetch"}
+    }, "required": ["id"]
+})
+def fetch_tool(snap: CorpusSnapshot, args: Dict[str, Any]) -> Dict[str, Any]:
+    doc_id = args.get("id", "")
+    if not isinstance(doc_id, str):
+        raise RPCError(-32602, "Document id must be a string")
+    text = snap.store.fetch_text(doc_id)
+    if text is None:
+        return {"content": [{
+            "type": "text",
+            "text": json.dumps({"error": "Document not found"})
+        }]}
+    return {"content": [{
+        "type": "text",
+        "text": text
+    }]}
+
+@rpc.tool("suggest", "Autocomplete a partial search query from terms in the knowledge base.", {
+    "type": "object", "properties": {
+        "query": {"type": "string", "description": "Partial search query; the last word is completed"},
+        "limit": {"type": "integer", "minimum": 1, "maximum": 50, "default": 10,
+                  "description": "Maximum number of suggestions"}
+    }, "required": ["query"]
+})
+def suggest_tool(snap: CorpusSnapshot, args: Dict[str, Any]) -> Dict[str, Any]:
+    return {"content": [{
+        "type": "text",
+        "text": encode_tool_text(snap.search_index.suggest(search_query(args), search_limit(args)))
+    }]}
+
+def tool_cache_key(tool: str, args: Dict[str, Any]) -> Tuple[str, str]:
+    return tool, json.dumps(args, sort_keys=True, default=str)
+
+def cached_tool_call(snap: CorpusSnapshot, tool: str, args: Dict[str, Any]) -> bytes:
+    key = tool_cache_key(tool, args)
+    result = RESULT_CACHE.get(key, snap.version)
+    if result is None:
+        value = rpc.call_tool(tool, snap, args)
+        result = encode_json(value)
+        if "partial" not in value:
+            RESULT_CACHE.put(key, snap.version, result)
+    return result
+
+# ──────────────── Static Responses ──────────────── #
+
+INITIALIZE_RESULT = encode_json({
+    "protocolVersion": "2024-11-05",
+    "capabilities": {"resources": {}, "tools": {}},
+    "serverInfo": {"name": "mcp-connexpay-fintech-server", "version": "1.0.0"}
+})
+
+TOOLS_LIST_RESULT = encode_json({"tools": rpc.tool_definitions()})
+
+# ──────────────── Listings ──────────────── #
+
+def resources_page(store: DocumentStore, cursor: Optional[str]) -> bytes:
+    positions, next_cursor = store.page(cursor, config.RESOURCES_PAGE_SIZE)
+    parts = [b'{"resources":[', b",".join(store.resource_entry(pos) for pos in positions), b"]"]
+    if next_cursor:
+        parts.append(b',"nextCursor":' + encode_json(next_cursor))
+    parts.append(b"}")
+    return b"".join(parts)
+
+def stream_browse(store: DocumentStore, facets: FacetIndex, mask: Optional[int]) -> Iterator[bytes]:
+    yield b'{"categories":{'
+    first = True
+    for category, bits in facets.bitmaps["category"].items():
+        category_mask = bits if mask is None else bits & mask
+        if not category_mask:
+            continue
+        yield (b"" if first else b",") + encode_json(category) + b":"
+        first = False
+        yield from iter_json_array((encode_json({
+            "id": doc["id"],
+            "title": doc["title"],
+            "topic": doc["metadata"]["topic"]
+        }) for doc in map(store.at, facets.positions(category_mask))), config.STREAM_CHUNK_SIZE)
+    total = len(store) if mask is None else mask.bit_count()
+    yield b'},"total_items":' + encode_json(total) + b',"facets":' + encode_json(facets.counts(mask)) + b"}"
+
+def stream_research_resources(store: DocumentStore, facets: FacetIndex, mask: int) -> Iterator[bytes]:
+    yield b'{"research_resources":'
+    yield from iter_json_array((encode_json({
+        "id": r["id"],
+        "title": r["title"],
+        "url": r["url"],
+        "topic": r["metadata"]["topic"]
+    }) for r in map(store.at, facets.positions(mask))), config.STREAM_CHUNK_SIZE)
+    yield b',"facets":' + encode_json(facets.counts(mask)) + b"}"
+
+def listing_filters(**facets: Optional[List[str]]) -> Dict[str, List[str]]:
+    return {field: values for field, values in facets.items() if values}
+
+def cached_listing(chunks: Iterator[bytes], key: Tuple[str, str], version: str) -> Iterator[bytes]:
+    # Streams as before; the finished body is kept when it is small enough,
+    # so a request never buffers more than LISTING_CACHE_MAX_BYTES.
+    kept: Optional[List[bytes]] = [] if LISTING_CACHE.maxsize > 0 else None
+    size = 0
+    for chunk in chunks:
+        yield chunk
+        if kept is not None:
+            size += len(chunk)
+            if size <= config.LISTING_CACHE_MAX_BYTES:
+                kept.append(chunk)
+            else:
+                kept = None
+    if kept is not None:
+        LISTING_CACHE.put(key, version, b"".join(kept))
+
+def read_head(chunks: Iterator[bytes], size: int) -> List[bytes]:
+    """Pull chunks until they add up to at least ``size`` bytes or run out."""
+    head: List[bytes] = []
+    total = 0
+    while total < size:
+        chunk = next(chunks, None)
+        if chunk is None:
+            break
+        head.append(chunk)
+        total += len(chunk)
+    return head
+
+def listing_response(request: Request, filters: Dict[str, List[str]],
+                     stream: Callable[[CorpusSnapshot, Dict[str, List[str]]], Iterator[bytes]]) -> Response:
+    """Conditional, compressed listing response.
+
+    The ETag is derived from the corpus version, the filters and the encoding,
+    so a matching If-None-Match is answered with 304 before any listing work.
+    Like the middleware, bodies under ``MCP_COMPRESSION_MIN_SIZE`` are sent
+    uncompressed; they are cached under the identity encoding.
+    """
+    snap = CORPUS.current
+    encoding = negotiate(request.headers.get("accept-encoding", "")) if config.COMPRESSION_ENABLED else "identity"
+    listing = f"{request.url.path}?{json.dumps(filters, sort_keys=True)}"
+    headers = {
+        "ETag": f'"{snap.version}-{hashlib.sha1(listing.encode()).hexdigest()[:12]}-{encoding}"',
+        "Vary": "Accept-Encoding",
+        "Cache-Control": "no-cache"
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    key = (listing, encoding)
+    body = LISTING_CACHE.get(key, snap.version)
+    if body is None and encoding != "identity":
+        small = LISTING_CACHE.get((listing, "identity"), snap.version)
+        if small is not None and len(small) < config.COMPRESSION_MIN_SIZE:
+            body, encoding = small, "identity"
+    if body is not None:
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(body, media_type="application/json", headers=headers)
+
+    chunks = iter(stream(snap, filters))
+    if encoding != "identity":
+        head = read_head(chunks, config.COMPRESSION_MIN_SIZE)
+        body = b"".join(head)
+        if len(body) < config.COMPRESSION_MIN_SIZE:
+            LISTING_CACHE.put((listing, "identity"), snap.version, body)
+            return Response(body, media_type="application/json", headers=headers)
+        headers["Content-Encoding"] = encoding
+        chunks = itertools.chain(head, chunks)
+    return StreamingResponse(cached_listing(compress_stream(chunks, encoding), key, snap.version),
+                             media_type="application/json", headers=headers)
+
+# ──────────────── MCP Methods ──────────────── #
+
+@rpc.method("initialize")
+def initialize(req: RPCRequest) -> bytes:
+    return INITIALIZE_RESULT
+
+@rpc.method("notifications/initialized")
+def notifications_initialized(req: RPCRequest) -> Dict[str, Any]:
+    return {
+        "status": "ok",
+        "timestamp": datetime.utcnow().isoformat()
+    }
 
-    results.sort(key=lambda r: r.text.count(query_lower), reverse=True)
-    return results[:limit]
+@rpc.method("resources/list")
+def resources_list(req: RPCRequest) -> bytes:
+    try:
+        return resources_page(CORPUS.current.store, req.params.get("cursor"))
+    except ValueError as e:
+        raise RPCError(-32602, str(e))
+
+@rpc.method("resources/read")
+def resources_read(req: RPCRequest) -> Dict[str, Any]:
+    uri = req.params.get("uri", "")
+    result = CORPUS.current.store.resolve_uri(uri)
+    if not result:
+        raise RPCError(-32602, f"Resource not found: {uri}")
+    return {
+        "contents": [{
+            "uri": uri,
+            "type": "text",
+            "mimeType": "text/plain",
+            "text": result.text
+        }]
+    }
 
-def fetch_knowledge(doc_id: str) -> Optional[FetchResult]:
-    for doc in KNOWLEDGE_BASE:
-        if doc["id"] == doc_id:
-            return FetchResult(
-                id=doc["id"],
-                title=doc["title"],
-                text=doc["content"],
-                url=doc["url"],
-                metadata=doc.get("metadata", {})
-            )
-    return None
+@rpc.method("tools/list")
+def tools_list(req: RPCRequest) -> bytes:
+    return TOOLS_LIST_RESULT
+
+@rpc.method("tools/call", blocking=True)
+def tools_call(req: RPCRequest) -> bytes:
+    return cached_tool_call(CORPUS.current, req.params.get("name"), req.params.get("arguments") or {})
+
+@rpc.stream("tools/call")
+def tools_call_stream(req: RPCRequest) -> Optional[Iterator[bytes]]:
+    if req.params.get("name") != "search":
+        return None
+    return stream_search(CORPUS.current, req)
+
+# ──────────────── Streaming Search ──────────────── #
+
+def stream_search(snap: CorpusSnapshot, req: RPCRequest) -> Iterator[bytes]:
+    """Yield progress notifications carrying ranked hits, then the final response.
+
+    Hits are only pushed when the client asked for progress with a
+    ``_meta.progressToken``; the final response matches the buffered one.
+    With search shards, each shard that answers pushes the provisional top
+    results merged so far, before the slowest shard is done. Without them
+    the ranking is complete before anything can be sent, and it is pushed
+    in ``MCP_SSE_CHUNK_SIZE`` chunks.
+    """
+    args = req.params.get("arguments") or {}
+    key = tool_cache_key("search", args)
+    cached = RESULT_CACHE.get(key, snap.version)
+    if cached is not None:
+        yield rpc_result(req.id, cached)
+        return
+
+    token = (req.params.get("_meta") or {}).get("progressToken")
+    query, limit, mode, filters = search_query(args), search_limit(args), search_mode(args), search_filters(args)
+    if snap.shards is not None and token is not None:
+        started = time.perf_counter()
+        for hits, matches, failed_shards, pending in snap.shards.search_progressive(
+                query, limit, mode, search_allowed(snap, filters)):
+            if pending:
+                yield rpc_notification("notifications/progress", {
+                    "progressToken": token,
+                    "progress": snap.shards.shard_count - pending,
+                    "total": snap.shards.shard_count,
+                    "provisional": True,
+                    "results": [to_search_result(snap, hit).dict() for hit in hits]
+                })
+        SEARCH_PHASES.observe(time.perf_counter() - started, "scoring")
+        token = None  # the final ranking goes out in the response only
+    else:
+        hits, matches, failed_shards = search_hits(snap, query, limit, mode, filters)
+    results: List[SearchResult] = []
+    for start in range(0, len(hits), config.SSE_CHUNK_SIZE):
+        chunk = [to_search_result(snap, hit) for hit in hits[start:start + config.SSE_CHUNK_SIZE]]
+        results.extend(chunk)
+        if token is not None:
+            yield rpc_notification("notifications/progress", {
+                "progressToken": token,
+                "progress": len(results),
+                "total": len(hits),
+                "results": [r.dict() for r in chunk]
+            })
+
+    result = encode_json(search_tool_result(snap, results, args, matches, failed_shards))
+    if not failed_shards:
+        RESULT_CACHE.put(key, snap.version, result)
+    yield rpc_result(req.id, result)
 
 # ──────────────── Endpoints ──────────────── #
 
@@ -112,119 +458,222 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    snap = CORPUS.current
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
-        "knowledge_items": len(KNOWLEDGE_BASE),
-        "categories": list({doc["metadata"]["category"] for doc in KNOWLEDGE_BASE}),
+        "knowledge_items": len(snap.store),
+        "categories": snap.categories,
+        "corpus_version": snap.version,
+        "corpus": CORPUS.stats(),
+        "result_cache": RESULT_CACHE.stats(),
+        "admission": ADMISSION.stats(),
+        "rate_limit": RATE_LIMITER.stats(),
         "chatgpt_compatible": True
     }
 
+REGISTRY.callback("mcp_corpus_documents", "Documents in the live corpus snapshot.", (),
+                  lambda: {(): len(CORPUS.current.store)}, aggregate="max")
+REGISTRY.callback("mcp_corpus_reloads_total", "Knowledge base reloads by outcome.", ("status",),
+                  lambda: {("ok",): CORPUS.reloads, ("failed",): CORPUS.reload_failures}, kind="counter")
+REGISTRY.callback("mcp_result_cache_entries", "Entries in the tools/call result cache.", (),
+                  lambda: {(): len(RESULT_CACHE)})
+REGISTRY.callback("mcp_result_cache_events_total", "Result cache lookups and removals by event.", ("event",),
+                  lambda: {(event,): getattr(RESULT_CACHE, event) for event in
+                           ("hits", "misses", "evictions", "expirations", "invalidations")}, kind="counter")
+REGISTRY.callback("mcp_admission_requests", "/mcp requests in progress and waiting for a slot.", ("state",),
+                  lambda: {("active",): ADMISSION.active, ("waiting",): ADMISSION.waiting})
+REGISTRY.callback("mcp_shed_requests_total", "/mcp requests turned away, by reason.", ("reason",),
+                  lambda: {("queue_full",): ADMISSION.rejected, ("queue_timeout",): ADMISSION.timed_out,
+                           ("rate_limited",): RATE_LIMITER.limited,
+                           ("over_budget",): RATE_LIMITER.over_budget}, kind="counter")
+
+# Under gunicorn, workers merge their metrics through MCP_SHARED_DIR, so any
+# worker can answer a scrape for all of them.
+SHARED_METRICS = SharedMetrics(REGISTRY, config.SHARED_DIR) if config.SHARED_DIR else None
+
+@app.get("/metrics")
+async def metrics():
+    if SHARED_METRICS is None:
+        return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+    text = await asyncio.get_running_loop().run_in_executor(None, SHARED_METRICS.render)
+    return Response(text, media_type="text/plain; version=0.0.4")
+
+async def write_metrics() -> None:
+    while True:
+        await asyncio.sleep(config.METRICS_WRITE_INTERVAL)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, SHARED_METRICS.write)
+        except OSError:
+            logger.exception("Failed to write metrics to %s", config.SHARED_DIR)
+
+@app.on_event("startup")
+async def start_metrics_writer():
+    if SHARED_METRICS is not None:
+        app.state.metrics_writer = asyncio.create_task(write_metrics())
+
+@app.on_event("shutdown")
+async def flush_metrics():
+    # A worker's final counts stay in the merged totals after it exits.
+    if SHARED_METRICS is not None:
+        SHARED_METRICS.write()
+
+# ──────────────── Batch Requests ──────────────── #
+
+def dispatch_batch_entry(entry: Any) -> Optional[bytes]:
+    try:
+        rpc_req = decode_request(entry)
+    except InvalidRequest:
+        INVALID_REQUESTS.inc()
+        return rpc_error(None, -32600, "Invalid MCP JSON-RPC request")
+    try:
+        body = PROFILER.call(rpc_req.method, rpc.dispatch, rpc_req)
+    except Exception as e:
+        logger.exception("Unhandled exception in /mcp batch entry")
+        body = rpc_error(rpc_req.id, -32603, f"Internal error: {str(e)}")
+    return None if rpc_req.is_notification else body
+
+async def dispatch_batch(entries: List[Any]) -> Response:
+    if not entries or len(entries) > config.MAX_BATCH_SIZE:
+        return json_bytes_response(rpc_error(None, -32600, "Invalid MCP JSON-RPC batch"), status_code=400)
+
+    loop = asyncio.get_running_loop()
+    bodies: List[Optional[bytes]] = [None] * len(entries)
+    offloaded = {}
+    for i, entry in enumerate(entries):
+        method = entry.get("method") if isinstance(entry, dict) else None
+        if isinstance(method, str) and rpc.is_blocking(method):
+            offloaded[i] = loop.run_in_executor(BLOCKING_EXECUTOR, dispatch_batch_entry, entry)
+        else:
+            bodies[i] = dispatch_batch_entry(entry)
+    for i, body in zip(offloaded, await asyncio.gather(*offloaded.values())):
+        bodies[i] = body
+
+    bodies = [body for body in bodies if body is not None]
+    if not bodies:
+        return Response(status_code=202)
+    return json_bytes_response(b"[" + b",".join(bodies) + b"]")
+
+# ──────────────── Admission Control ──────────────── #
+
+def client_key(request: Request) -> str:
+    # Client-chosen headers such as Mcp-Session-Id would let a client mint a
+    # fresh bucket per request, so only a trusted proxy's X-Client-Id counts.
+    if config.TRUST_CLIENT_ID:
+        client_id = request.headers.get("x-client-id")
+        if client_id:
+            return client_id
+    return request.client.host if request.client else "unknown"
+
+def request_cost(payload: Any) -> float:
+    if not RATE_LIMITER.enabled:
+        return 0.0
+    cost = 0.0
+    for entry in payload if isinstance(payload, list) else [payload]:
+        if isinstance(entry, dict):
+            params = entry.get("params")
+            tool = params.get("name") if isinstance(params, dict) else None
+            cost += RATE_LIMITER.cost(str(entry.get("method")), tool if isinstance(tool, str) else None)
+    return cost
+
+def overloaded_response(payload: Any, e: Overloaded) -> Response:
+    req_id = payload.get("id") if isinstance(payload, dict) else None
+    if e.reason == "over_budget":
+        # Waiting never helps, so there is no Retry-After.
+        return json_bytes_response(rpc_error(req_id, -32600, "Request exceeds the rate limit budget"),
+                                   status_code=400)
+    if e.reason == "rate_limited":
+        status_code, message = 429, "Rate limit exceeded, retry later"
+    else:
+        status_code, message = 503, "Server overloaded, retry later"
+    return json_bytes_response(rpc_error(req_id, -32000, message), status_code=status_code,
+                               headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))})
+
+def release_after_stream(response: StreamingResponse) -> StreamingResponse:
+    # The slot is held until the stream ends; the background task covers
+    # a client that disconnects before the first chunk. Both run release on
+    # the event loop: a plain function would be sent to a worker thread.
+    released = False
+
+    async def release() -> None:
+        nonlocal released
+        if not released:
+            released = True
+            ADMISSION.release()
+
+    async def body(chunks):
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await release()
+
+    response.body_iterator = body(response.body_iterator)
+    response.background = BackgroundTask(release)
+    return response
+
+# ──────────────── MCP Endpoint ──────────────── #
+
+def accepts_event_stream(request: Request) -> bool:
+    return "text/event-stream" in request.headers.get("accept", "")
+
 @app.post("/mcp")
 async def mcp_handler(request: Request):
     try:
-        try:
-            json_data = await request.json()
-            mcp_req = MCPRequest(**json_data)
-        except Exception:
-            raise HTTPException(status_code=400, detail="Invalid MCP JSON-RPC request")
-
-        logger.info(f"Received MCP method: {mcp_req.method}")
-
-        if mcp_req.method == "initialize":
-            return MCPResponse(id=mcp_req.id, result={
-                "protocolVersion": "2024-11-05",
-                "capabilities": {"resources": {}, "tools": {}},
-                "serverInfo": {"name": "mcp-connexpay-fintech-server", "version": "1.0.0"}
-            }).dict()
-
-        elif mcp_req.method == "notifications/initialized":
-            return MCPResponse(id=mcp_req.id, result={
-                "status": "ok",
-                "timestamp": datetime.utcnow().isoformat()
-            }).dict()
-
-        elif mcp_req.method == "resources/list":
-            resources = [{
-                "uri": f"knowledge://{doc['id']}",
-                "name": doc["title"],
-                "description": doc["content"][:200] + "..." if len(doc["content"]) > 200 else doc["content"],
-                "type": "resource",
-                "mimeType": "text/plain"
-            } for doc in KNOWLEDGE_BASE]
-
-            return MCPResponse(id=mcp_req.id, result={"resources": resources}).dict()
-
-        elif mcp_req.method == "resources/read":
-            uri = mcp_req.params.get("uri", "")
-            if uri.startswith("knowledge://"):
-                doc_id = uri.split("knowledge://")[1]
-                result = fetch_knowledge(doc_id)
-                if result:
-                    return MCPResponse(id=mcp_req.id, result={
-                        "contents": [{
-                            "uri": uri,
-                            "type": "text",
-                            "mimeType": "text/plain",
-                            "text": result.text
-                        }]
-                    }).dict()
-            return MCPResponse(id=mcp_req.id, error={
-                "code": -32602, "message": f"Resource not found: {uri}"
-            }).dict()
-
-        elif mcp_req.method == "tools/list":
-            return MCPResponse(id=mcp_req.id, result={
-                "tools": [
-                    {
-                        "name": "search",
-                        "description": "Search through ConnexPay and FinTech knowledge base.",
-                        "inputSchema": {"type": "object", "properties": {
-                            "query": {"type": "string", "description": "Search query string"}
-                        }, "required": ["query"]}
-                    },
-                    {
-                        "name": "fetch",
-                        "description": "Fetch full article by ID.",
-                        "inputSchema": {"type": "object", "properties": {
-                            "id": {"type": "string", "description": "Document ID to fetch"}
-                        }, "required": ["id"]}
-                    }
-                ]
-            }).dict()
-
-        elif mcp_req.method == "tools/call":
-            tool = mcp_req.params.get("name")
-            args = mcp_req.params.get("arguments", {})
-            if tool == "search":
-                query = args.get("query", "").strip()
-                if not query:
-                    raise ValueError("Missing search query")
-                results = search_knowledge(query)
-                return MCPResponse(id=mcp_req.id, result={"content": [{
-                    "type": "text",
-                    "text": json.dumps([r.dict() for r in results], indent=2)
-                }]}).dict()
-            elif tool == "fetch":
-                doc_id = args.get("id", "")
-                result = fetch_knowledge(doc_id)
-                if not result:
-                    return MCPResponse(id=mcp_req.id, result={"content": [{
-                        "type": "text",
-                        "text": json.dumps({"error": "Document not found"})
-                    }]}).dict()
-                return MCPResponse(id=mcp_req.id, result={"content": [{
-                    "type": "text",
-                    "text": json.dumps(result.dict(), indent=2)
-                }]}).dict()
-            else:
-                raise ValueError(f"Unknown tool: {tool}")
+        payload = decode_body(await request.body())
+    except InvalidRequest:
+        INVALID_REQUESTS.inc()
+        return json_bytes_response(rpc_error(None, -32600, "Invalid MCP JSON-RPC request"), status_code=400)
+    try:
+        RATE_LIMITER.take(client_key(request), request_cost(payload))
+        await ADMISSION.acquire()
+    except Overloaded as e:
+        if config.LOG_REQUESTS:
+            logger.warning("Shed /mcp request from %s: %s", client_key(request), e.reason)
+        return overloaded_response(payload, e)
+
+    try:
+        response = await handle_mcp(request, payload)
+    except BaseException:
+        ADMISSION.release()
+        raise
+    if isinstance(response, StreamingResponse):
+        return release_after_stream(response)
+    ADMISSION.release()
+    return response
+
+async def handle_mcp(request: Request, payload: Any) -> Response:
+    try:
+        if isinstance(payload, list):
+            if config.LOG_REQUESTS:
+                logger.info("Received MCP batch of %d requests", len(payload))
+            return await dispatch_batch(payload)
+        rpc_req = decode_request(payload)
+    except InvalidRequest:
+        INVALID_REQUESTS.inc()
+        return json_bytes_response(rpc_error(None, -32600, "Invalid MCP JSON-RPC request"), status_code=400)
 
+    try:
+        if config.LOG_REQUESTS:
+            logger.info("Received MCP method: %s", rpc_req.method)
+        if config.SSE_ENABLED and accepts_event_stream(request) and not rpc_req.is_notification:
+            messages = rpc.dispatch_stream(rpc_req)
+            if messages is not None:
+                return StreamingResponse(map(sse_event, messages), media_type="text/event-stream",
+                                         headers={"Cache-Control": "no-cache"})
+        if rpc.is_blocking(rpc_req.method):
+            body = await asyncio.get_running_loop().run_in_executor(
+                BLOCKING_EXECUTOR, PROFILER.call, rpc_req.method, rpc.dispatch, rpc_req)
         else:
-            raise ValueError(f"Unknown method: {mcp_req.method}")
+            body = rpc.dispatch(rpc_req)
+        if rpc_req.is_notification:
+            return Response(status_code=202)
+        return json_bytes_response(body)
 
     except Exception as e:
         logger.exception("Unhandled exception in /mcp")
+        if rpc_req.is_notification:
+            return Response(status_code=202)
         return JSONResponse(status_code=500, content={
             "jsonrpc": "2.0",
             "error": {"code": -32603, "message": f"Internal error: {str(e)}"},
@@ -238,32 +687,106 @@ async def reject_get():
     })
 
 @app.get("/browse")
-async def browse_knowledge():
-    by_category = {}
-    for doc in KNOWLEDGE_BASE:
-        category = doc["metadata"]["category"]
-        by_category.setdefault(category, []).append({
-            "id": doc["id"],
-            "title": doc["title"],
-            "topic": doc["metadata"]["topic"]
-        })
-    return {
-        "categories": by_category,
-        "total_items": len(KNOWLEDGE_BASE)
-    }
+async def browse_knowledge(request: Request, category: Optional[List[str]] = Query(None),
+                           topic: Optional[List[str]] = Query(None), type: Optional[List[str]] = Query(None)):
+    return listing_response(request, listing_filters(category=category, topic=topic, type=type),
+                            lambda snap, filters: stream_browse(snap.store, snap.facet_index,
+                                                                snap.facet_index.mask(filters)))
 
 @app.get("/research_resources")
-async def get_research_docs():
-    return {
-        "research_resources": [
-            {
-                "id": r["id"],
-                "title": r["title"],
-                "url": r["url"],
-                "topic": r["metadata"]["topic"]
-            } for r in KNOWLEDGE_BASE if r["metadata"]["category"] == "Research Tools"
-        ]
-    }
+async def get_research_docs(request: Request, topic: Optional[List[str]] = Query(None),
+                            type: Optional[List[str]] = Query(None)):
+    return listing_response(request, listing_filters(category=["Research Tools"], topic=topic, type=type),
+                            lambda snap, filters: stream_research_resources(snap.store, snap.facet_index,
+                                                                            snap.facet_index.mask(filters)))
+
+# ──────────────── Knowledge Base Reload ──────────────── #
+
+async def reload_corpus() -> CorpusSnapshot:
+    # Index building runs on a worker thread; requests keep reading the
+    # previous snapshot until the swap.
+    snap = await asyncio.get_running_loop().run_in_executor(None, CORPUS.reload)
+    RESULT_CACHE.retain(snap.version)
+    LISTING_CACHE.retain(snap.version)
+    return snap
+
+# POST /admin/reload on one worker writes "<token> <version>" here, and every
+# other worker polls it and reloads too.
+RELOAD_TRIGGER = os.path.join(config.SHARED_DIR, "reload") if config.SHARED_DIR else None
+
+def read_reload_trigger() -> Optional[str]:
+    try:
+        with open(RELOAD_TRIGGER, encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def write_reload_trigger(version: str) -> None:
+    trigger = f"{os.getpid()}-{time.time_ns()} {version}"
+    tmp = f"{RELOAD_TRIGGER}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(trigger)
+    os.replace(tmp, RELOAD_TRIGGER)
+    app.state.reload_trigger = trigger  # already reloaded here
+
+async def watch_reload_trigger() -> None:
+    trigger = app.state.reload_trigger = read_reload_trigger()
+    if trigger is not None and trigger.split()[-1] != CORPUS.current.version:
+        # Forked after a reload, so the corpus preloaded in the master is out of date.
+        try:
+            await reload_corpus()
+        except Exception:
+            pass  # already logged
+    while True:
+        await asyncio.sleep(config.RELOAD_POLL_INTERVAL)
+        trigger = read_reload_trigger()
+        if trigger != app.state.reload_trigger:
+            app.state.reload_trigger = trigger
+            try:
+                await reload_corpus()
+            except Exception:
+                pass  # already logged; this worker keeps its snapshot
+
+async def watch_corpus() -> None:
+    while True:
+        await asyncio.sleep(config.KNOWLEDGE_BASE_WATCH_INTERVAL)
+        if CORPUS.source_changed():
+            try:
+                await reload_corpus()
+            except Exception:
+                pass  # already logged; retried on the next change
+
+@app.on_event("startup")
+async def start_search_shards():
+    # Forked here rather than at import so each gunicorn worker owns its shards.
+    if CORPUS.current.shards is not None:
+        await asyncio.get_running_loop().run_in_executor(None, CORPUS.current.shards.start)
+
+@app.on_event("startup")
+async def start_corpus_watcher():
+    if config.KNOWLEDGE_BASE_PATH and config.KNOWLEDGE_BASE_WATCH_INTERVAL > 0:
+        app.state.corpus_watcher = asyncio.create_task(watch_corpus())
+
+@app.on_event("startup")
+async def start_reload_watcher():
+    if RELOAD_TRIGGER is not None and config.ADMIN_TOKEN:
+        app.state.reload_watcher = asyncio.create_task(watch_reload_trigger())
+
+@app.post("/admin/reload")
+async def admin_reload(request: Request):
+    if not config.ADMIN_TOKEN:
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    if request.headers.get("authorization") != f"Bearer {config.ADMIN_TOKEN}":
+        return JSONResponse(status_code=401, content={"error": "Invalid admin token"})
+    try:
+        snap = await reload_corpus()
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": f"Reload failed: {str(e)}", "corpus": CORPUS.stats()})
+    if RELOAD_TRIGGER is not None:
+        write_reload_trigger(snap.version)
+    return {"status": "reloaded", "knowledge_items": len(snap.store), "corpus": CORPUS.stats()}
 
 if __name__ == "__main__":
+    # Single-process development server with autoreload; production runs
+    # multiple workers under gunicorn (see gunicorn.conf.py).
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,297 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("mcp-server")
+
+# ──────────────── Metric Families ──────────────── #
+
+LabelValues = Tuple[str, ...]
+
+class _Family:
+    """A named metric with one series per label-value tuple.
+
+    Each thread updates its own cells, so recording takes no lock and never
+    loses an update; a scrape sums the cells of every thread.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._local = threading.local()
+        self._thread_cells: List[Dict[LabelValues, List[float]]] = []
+        self._register_lock = threading.Lock()
+
+    def _cells(self) -> Dict[LabelValues, List[float]]:
+        try:
+            return self._local.cells
+        except AttributeError:
+            cells = self._local.cells = {}
+            with self._register_lock:
+                self._thread_cells.append(cells)
+            return cells
+
+    def collect(self) -> Dict[LabelValues, List[float]]:
+        """Cells of every thread in this process, summed."""
+        merged: Dict[LabelValues, List[float]] = {}
+        with self._register_lock:
+            thread_cells = list(self._thread_cells)
+        for cells in thread_cells:
+            for labels, cell in list(cells.items()):
+                total = merged.get(labels)
+                if total is None:
+                    merged[labels] = list(cell)
+                else:
+                    for i, value in enumerate(cell):
+                        total[i] += value
+        return merged
+
+    def _series(self, labels: LabelValues, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self, cells: Optional[Dict[LabelValues, List[float]]] = None) -> Iterable[str]:
+        """Exposition lines for ``cells``, by default the values collected in this process."""
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self._lines(self.collect() if cells is None else cells)
+
+    def _lines(self, cells: Dict[LabelValues, List[float]]) -> Iterable[str]:
+        for labels, (value,) in sorted(cells.items()):
+            yield f"{self.name}{self._series(labels)} {_number(value)}"
+
+class Counter(_Family):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        cells = self._cells()
+        cell = cells.get(labels)
+        if cell is None:
+            cells[labels] = [amount]
+        else:
+            cell[0] += amount
+
+# Seconds; spans cache hits (tens of microseconds) to slow searches.
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+class Histogram(_Family):
+    """Cells hold one count per bucket, an overflow count, then the sum."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        cells = self._cells()
+        cell = cells.get(labels)
+        if cell is None:
+            cell = cells[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def _lines(self, cells: Dict[LabelValues, List[float]]) -> Iterable[str]:
+        for labels, cell in sorted(cells.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), cell):
+                cumulative += count
+                series = self._series(labels, f'le="{bound}"')
+                yield f"{self.name}_bucket{series} {cumulative}"
+            yield f"{self.name}_sum{self._series(labels)} {cell[-1]!r}"
+            yield f"{self.name}_count{self._series(labels)} {cumulative}"
+
+class Callback(_Family):
+    """Values read at scrape time from state kept elsewhere, e.g. cache stats.
+
+    ``read`` returns {label values: value}; ``kind`` is "gauge" or "counter".
+    ``aggregate`` is how gauges of several workers combine: "sum" or "max".
+    """
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str],
+                 read: Callable[[], Dict[LabelValues, float]], kind: str = "gauge", aggregate: str = "sum"):
+        super().__init__(name, help_text, labels)
+        self._read = read
+        self.kind = kind
+        self.aggregate = aggregate
+
+    def collect(self) -> Dict[LabelValues, List[float]]:
+        return {labels: [value] for labels, value in self._read().items()}
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Registry:
+    def __init__(self):
+        self._families: List[_Family] = []
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def callback(self, name: str, help_text: str, labels: Sequence[str],
+                 read: Callable[[], Dict[LabelValues, float]], kind: str = "gauge",
+                 aggregate: str = "sum") -> Callback:
+        return self._add(Callback(name, help_text, labels, read, kind, aggregate))
+
+    def _add(self, family: Any) -> Any:
+        self._families.append(family)
+        return family
+
+    @property
+    def families(self) -> List[_Family]:
+        return list(self._families)
+
+    def collect(self) -> Dict[str, Dict[LabelValues, List[float]]]:
+        return {family.name: family.collect() for family in self._families}
+
+    def render(self, values: Optional[Dict[str, Dict[LabelValues, List[float]]]] = None) -> str:
+        """Prometheus text exposition format, version 0.0.4, of ``values`` or this process."""
+        return "\n".join(line for family in self._families
+                         for line in family.render(None if values is None else values.get(family.name, {}))) + "\n"
+
+# ──────────────── Multi-Process Aggregation ──────────────── #
+
+class SharedMetrics:
+    """Merges the metrics of every gunicorn worker through files in a shared directory.
+
+    Each worker writes its values to ``metrics-<pid>.json`` from time to time
+    and right before answering a scrape, and a scrape merges the files of all
+    workers. Counters and histograms of workers that have exited still count,
+    so totals do not go back when gunicorn replaces a worker; gauges count the
+    live workers only.
+    """
+
+    _FILE = re.compile(r"metrics-(\d+)\.json")
+
+    def __init__(self, registry: Registry, directory: str):
+        self.registry = registry
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self) -> None:
+        values = {name: [[list(labels), cell] for labels, cell in cells.items()]
+                  for name, cells in self.registry.collect().items()}
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(values, f)
+        os.replace(tmp, path)  # readers see the previous or the new file, never half of one
+
+    def collect(self) -> Dict[str, Dict[LabelValues, List[float]]]:
+        self.write()
+        families = {family.name: family for family in self.registry.families}
+        merged: Dict[str, Dict[LabelValues, List[float]]] = {}
+        for filename in sorted(os.listdir(self.directory)):
+            match = self._FILE.fullmatch(filename)
+            if match is None:
+                continue
+            try:
+                with open(os.path.join(self.directory, filename), encoding="utf-8") as f:
+                    values = json.load(f)
+            except (OSError, ValueError):
+                continue
+            live = _alive(int(match.group(1)))
+            for name, series in values.items():
+                family = families.get(name)
+                if family is None or (family.kind == "gauge" and not live):
+                    continue
+                take_max = getattr(family, "aggregate", "sum") == "max"
+                cells = merged.setdefault(name, {})
+                for labels, cell in series:
+                    total = cells.get(tuple(labels))
+                    if total is None:
+                        cells[tuple(labels)] = list(cell)
+                    else:
+                        for i, value in enumerate(cell):
+                            total[i] = max(total[i], value) if take_max else total[i] + value
+        return merged
+
+    def render(self) -> str:
+        return self.registry.render(self.collect())
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+# ──────────────── Server Metrics ──────────────── #
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.counter(
+    "mcp_requests_total", "JSON-RPC requests by method and outcome (ok, error, exception).", ("method", "status"))
+REQUEST_LATENCY = REGISTRY.histogram(
+    "mcp_request_duration_seconds", "Time to dispatch a JSON-RPC request, by method.", ("method",))
+INVALID_REQUESTS = REGISTRY.counter(
+    "mcp_invalid_requests_total", "Bodies and batch entries rejected as invalid JSON-RPC.")
+TOOL_CALLS = REGISTRY.counter(
+    "mcp_tool_calls_total", "tools/call invocations by tool and outcome (ok, exception).", ("tool", "status"))
+TOOL_LATENCY = REGISTRY.histogram(
+    "mcp_tool_duration_seconds", "Time spent in a tool handler, by tool; cached results skip the handler.", ("tool",))
+SEARCH_PHASES = REGISTRY.histogram(
+    "mcp_search_phase_seconds", "Time per search phase: scoring, snippets, serialization.", ("phase",))
+
+# ──────────────── Slow Request Profiling ──────────────── #
+
+class SlowRequestProfiler:
+    """Profile a random sample of calls and report the ones slower than ``threshold`` seconds.
+
+    Reports go to the log as the top functions by cumulative time and, when
+    ``output_dir`` is set, to ``.prof`` files for ``pstats``/snakeviz. With a
+    sample rate of 0 a call costs one comparison.
+    """
+
+    def __init__(self, sample_rate: float, threshold: float, output_dir: Optional[str] = None, top: int = 25):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.output_dir = output_dir
+        self.top = top
+        self.profiled = 0
+        self.reported = 0
+
+    def call(self, label: str, fn: Callable[..., Any], *args: Any) -> Any:
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return fn(*args)
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            return profile.runcall(fn, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.profiled += 1
+            if elapsed >= self.threshold:
+                self.reported += 1
+                self._report(label, elapsed, profile)
+
+    def _report(self, label: str, elapsed: float, profile: cProfile.Profile) -> None:
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(self.top)
+        logger.warning("Slow request %s took %.1fms; profile:\n%s", label, elapsed * 1000, out.getvalue())
+        if self.output_dir:
+            name = f"{label.replace('/', '_')}-{int(time.time() * 1000)}-{os.getpid()}.prof"
+            profile.dump_stats(os.path.join(self.output_dir, name))
@@ -0,0 +1,20 @@
+from pydantic import BaseModel, ConfigDict
+from typing import Dict, Any, Optional
+
+# ──────────────── Models ──────────────── #
+
+class SearchResult(BaseModel):
+    id: str
+    title: str
+    text: str
+    url: str
+
+class FetchResult(BaseModel):
+    # Built once per document by the DocumentStore and shared between requests.
+    model_config = ConfigDict(frozen=True)
+
+    id: str
+    title: str
+    text: str
+    url: str
+    metadata: Optional[Dict[str, Any]] = None
@@ -0,0 +1,113 @@
+import json
+from array import array
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+# Read-only sequences over flat buffers, used by indexes loaded from an
+# on-disk snapshot so nothing has to be decoded up front.
+
+_DECODERS: Dict[str, Callable[[bytes], Any]] = {
+    "utf-8": lambda raw: raw.decode("utf-8"),
+    "json": json.loads,
+    "bytes": bytes
+}
+
+def pack_strings(items: Iterable[Union[str, bytes]]) -> Tuple[bytes, array]:
+    """Concatenate items into one blob plus an ``n + 1`` offsets array."""
+    parts: List[bytes] = []
+    offsets = array("q", [0])
+    total = 0
+    for item in items:
+        raw = item.encode("utf-8") if isinstance(item, str) else item
+        parts.append(raw)
+        total += len(raw)
+        offsets.append(total)
+    return b"".join(parts), offsets
+
+class PackedStrings(Sequence):
+    """Sequence view over a packed blob, decoding one item per access."""
+
+    __slots__ = ("_blob", "_offsets", "_decode")
+
+    def __init__(self, blob: Union[bytes, memoryview], offsets: Sequence[int], codec: str = "utf-8"):
+        self._blob = memoryview(blob)
+        self._offsets = offsets
+        self._decode = _DECODERS[codec]
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._decode(bytes(self._blob[self._offsets[i]:self._offsets[i + 1]]))
+
+    def __iter__(self) -> Iterator[Any]:
+        for i in range(len(self)):
+            yield self[i]
+
+class SortedKeyMap:
+    """Read-only ``str -> int`` mapping over sorted keys, looked up by bisection.
+
+    Values default to the key's own rank, which is how term ids are assigned.
+    """
+
+    __slots__ = ("_keys", "_values")
+
+    def __init__(self, keys: Sequence[str], values: Optional[Sequence[int]] = None):
+        self._keys = keys
+        self._values = values
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def get(self, key: str, default: Optional[int] = None) -> Optional[int]:
+        if not isinstance(key, str):
+            return default  # not comparable with the keys, and never one of them
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            return i if self._values is None else self._values[i]
+        return default
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __getitem__(self, key: str) -> int:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+class LazyList(Sequence):
+    """Sequence whose items are built on first access and then kept."""
+
+    __slots__ = ("_factory", "_items")
+
+    def __init__(self, length: int, factory: Callable[[int], Any]):
+        self._factory = factory
+        self._items: List[Any] = [None] * length
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        item = self._items[i]
+        if item is None:
+            item = self._items[i] = self._factory(i if i >= 0 else i + len(self))
+        return item
+
+def pack_into(sections: Dict[str, Any], name: str, items: Iterable[Union[str, bytes]]) -> None:
+    """Store ``items`` as the ``name`` and ``name.offsets`` sections of a snapshot."""
+    sections[name], sections[f"{name}.offsets"] = pack_strings(items)
+
+def unpack(sections: Dict[str, memoryview], name: str, codec: str = "utf-8") -> PackedStrings:
+    return PackedStrings(sections[name], sections[f"{name}.offsets"].cast("q"), codec)
@@ -0,0 +1,70 @@
+import json
+from typing import Any, Dict, Iterable, Iterator, Optional, Union
+
+from fastapi.responses import Response
+
+import config
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional speedup
+    orjson = None
+
+# ──────────────── JSON Encoding ──────────────── #
+
+def encode_json(obj: Any) -> bytes:
+    """Compact UTF-8 JSON, via orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def encode_tool_text(obj: Any) -> str:
+    """Serialize a tool result for a text content item.
+
+    Pretty-printed by default for compatibility; MCP_COMPACT_JSON switches to
+    the compact encoder, which is faster and produces smaller payloads.
+    """
+    if config.COMPACT_TOOL_JSON:
+        return encode_json(obj).decode("utf-8")
+    return json.dumps(obj, indent=2)
+
+def iter_json_array(items: Iterable[bytes], chunk_size: int) -> Iterator[bytes]:
+    """Yield a JSON array of pre-encoded items in chunks of ``chunk_size`` items."""
+    chunk = [b"["]
+    count = 0
+    for item in items:
+        if count:
+            chunk.append(b",")
+        chunk.append(item)
+        count += 1
+        if count % chunk_size == 0:
+            yield b"".join(chunk)
+            chunk = []
+    chunk.append(b"]")
+    yield b"".join(chunk)
+
+# ──────────────── JSON-RPC Envelopes ──────────────── #
+
+RequestId = Optional[Union[str, int]]
+
+_RESULT_PREFIX = b'{"jsonrpc":"2.0","id":'
+
+def rpc_result(req_id: RequestId, result: Union[bytes, Dict[str, Any]]) -> bytes:
+    """Build a JSON-RPC response, splicing the id into a pre-serialized result."""
+    if not isinstance(result, bytes):
+        result = encode_json(result)
+    return b"".join((_RESULT_PREFIX, encode_json(req_id), b',"result":', result, b',"error":null}'))
+
+def rpc_error(req_id: RequestId, code: int, message: str) -> bytes:
+    return b"".join((_RESULT_PREFIX, encode_json(req_id), b',"result":null,"error":',
+                     encode_json({"code": code, "message": message}), b"}"))
+
+def rpc_notification(method: str, params: Dict[str, Any]) -> bytes:
+    return encode_json({"jsonrpc": "2.0", "method": method, "params": params})
+
+def sse_event(message: bytes) -> bytes:
+    """Frame one JSON-RPC message as a server-sent event."""
+    return b"event: message\ndata: " + message + b"\n\n"
+
+def json_bytes_response(body: bytes, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+class ResultCache:
+    """Bounded LRU cache with optional TTL, keyed by corpus version and key.
+
+    Callers pass along the corpus version their request reads, so requests
+    still on an old snapshot never see or evict entries of a newer one.
+    ``retain`` is called once a new version is live: it drops the entries of
+    every other version, and later puts for those versions are ignored.
+    With ``maxbytes`` the values must be bytes, and least recently used
+    entries are also evicted to keep their total length within it; a value
+    longer than ``maxbytes`` is not kept at all.
+    """
+
+    def __init__(self, maxsize: int, ttl: float = 0.0, clock: Callable[[], float] = time.monotonic,
+                 maxbytes: int = 0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self._bytes = 0
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, Any]]" = OrderedDict()
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def retain(self, version: str) -> None:
+        """Make ``version`` the live one and drop the entries of any other."""
+        with self._lock:
+            self._version = version
+            stale = [entry for entry in self._entries if entry[0] != version]
+            if stale:
+                self.invalidations += 1
+            for entry in stale:
+                self._pop(entry)
+
+    def _size(self, value: Any) -> int:
+        return len(value) if self.maxbytes > 0 else 0
+
+    def _pop(self, key: Tuple[str, Hashable]) -> None:
+        _expires_at, value = self._entries.pop(key)
+        self._bytes -= self._size(value)
+
+    def get(self, key: Hashable, version: str) -> Optional[Any]:
+        if self.maxsize <= 0:
+            return None
+        key = (version, key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at and expires_at <= self._clock():
+                self._pop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, version: str, value: Any) -> None:
+        if self.maxsize <= 0 or self._size(value) > self.maxbytes > 0:
+            return
+        expires_at = self._clock() + self.ttl if self.ttl > 0 else 0.0
+        key = (version, key)
+        with self._lock:
+            if self._version is not None and version != self._version:
+                return  # computed from a snapshot that has since been replaced
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (expires_at, value)
+            self._bytes += self._size(value)
+            while len(self._entries) > self.maxsize or self._bytes > self.maxbytes > 0:
+                self._pop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "bytes": self._bytes,
+            "maxbytes": self.maxbytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "version": self._version
+        }
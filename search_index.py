@@ -0,0 +1,376 @@
+import heapq
+import math
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from packed import LazyList, SortedKeyMap, pack_into, unpack
+from term_dictionary import TermDictionary, max_edit_distance
+
+# ──────────────── Tokenization ──────────────── #
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+# ──────────────── Document Records ──────────────── #
+
+SENTENCE_SEPARATOR = ". "
+SNIPPET_LENGTH = 300
+
+def _clip_snippet(snippet: str) -> str:
+    return snippet.strip()[:SNIPPET_LENGTH] + "..." if len(snippet) > SNIPPET_LENGTH else snippet
+
+class DocRecord:
+    """Per-document data needed to render a search hit without re-scanning text.
+
+    ``sentence_bounds`` holds flat (start, end) offsets into ``content_norm``
+    for every sentence, so a snippet is a single slice.
+    """
+
+    __slots__ = ("id", "title", "url", "content_norm", "sentence_bounds", "fallback_snippet")
+
+    def __init__(self, doc: Dict[str, Any]):
+        self.id = doc["id"]
+        self.title = doc["title"]
+        self.url = doc["url"]
+        self.content_norm = doc["content"].lower()
+        self.sentence_bounds = array("i")
+        start = 0
+        while True:
+            end = self.content_norm.find(SENTENCE_SEPARATOR, start)
+            if end < 0:
+                self.sentence_bounds.extend((start, len(self.content_norm)))
+                break
+            self.sentence_bounds.extend((start, end))
+            start = end + len(SENTENCE_SEPARATOR)
+        self.fallback_snippet = self.snippet(0)
+
+    @classmethod
+    def from_parts(cls, doc_id: str, title: str, url: str, content_norm: str,
+                   sentence_bounds: Sequence[int], fallback_snippet: str) -> "DocRecord":
+        record = cls.__new__(cls)
+        record.id = doc_id
+        record.title = title
+        record.url = url
+        record.content_norm = content_norm
+        record.sentence_bounds = sentence_bounds
+        record.fallback_snippet = fallback_snippet
+        return record
+
+    @property
+    def sentence_count(self) -> int:
+        return len(self.sentence_bounds) // 2
+
+    def sentence(self, i: int) -> str:
+        return self.content_norm[self.sentence_bounds[2 * i]:self.sentence_bounds[2 * i + 1]]
+
+    def snippet(self, i: int) -> str:
+        return _clip_snippet(self.sentence(i))
+
+class SearchHit(NamedTuple):
+    doc_pos: int
+    score: float
+    sentence: int  # first content sentence containing a query term, -1 if none
+
+# ──────────────── Inverted Index ──────────────── #
+
+SEARCH_MODES = ("bm25", "tfidf")
+
+# Same relative weighting as the original substring scorer (+10 / +5 / +3).
+FIELD_BOOSTS = {"title": 10.0, "content": 5.0, "topic": 3.0}
+_FIELDS = tuple(FIELD_BOOSTS)
+_FIELD_WEIGHTS = tuple(FIELD_BOOSTS[f] / FIELD_BOOSTS["content"] for f in _FIELDS)
+
+def document_fields(doc: Dict[str, Any]) -> Tuple[str, str, str]:
+    return doc["title"], doc["content"], doc.get("metadata", {}).get("topic", "")
+
+class SearchIndex:
+    """BM25F and TF-IDF index over title/content/topic, built once per corpus.
+
+    Postings hold a precomputed impact (idf * saturated field-weighted tf) per
+    (term, doc), so a query only sums impacts over the postings of its terms.
+    Each posting also records the first content sentence containing the term,
+    which is all the snippet builder needs at query time.
+
+    The same postings double as a term-major (CSC) sparse document-term
+    matrix: ``tfidf_weights`` holds L2-normalized sublinear TF-IDF values
+    aligned with ``post_docs``, so the ``tfidf`` mode scores a query with one
+    sparse matrix-vector product in NumPy.
+
+    Postings of a term are sorted by document, so a search can be limited to a
+    contiguous range of documents by bisecting each posting list; a search
+    shard scores its range of one shared index that way.
+    """
+
+    def __init__(self, docs: Sequence[Dict[str, Any]], k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_count = len(docs)
+        self.records: List[DocRecord] = []
+
+        field_counts: List[Tuple[Counter, ...]] = []
+        first_sentences: List[Dict[str, int]] = []
+        totals = [0] * len(_FIELDS)
+        for doc in docs:
+            record = DocRecord(doc)
+            title, _content, topic = document_fields(doc)
+            content_counts: Counter = Counter()
+            first_sentence: Dict[str, int] = {}
+            for i in range(record.sentence_count):
+                terms = tokenize(record.sentence(i))
+                content_counts.update(terms)
+                for term in terms:
+                    first_sentence.setdefault(term, i)
+            counts = (Counter(tokenize(title)), content_counts, Counter(tokenize(topic)))
+            for i, c in enumerate(counts):
+                totals[i] += sum(c.values())
+            self.records.append(record)
+            field_counts.append(counts)
+            first_sentences.append(first_sentence)
+
+        n = max(self.doc_count, 1)
+        avg_lengths = [max(t / n, 1.0) for t in totals]
+
+        raw: Dict[str, List[Tuple[int, float, float]]] = {}
+        for doc_pos, counts in enumerate(field_counts):
+            norms = [1.0 - b + b * (sum(c.values()) / avg) for c, avg in zip(counts, avg_lengths)]
+            weighted: Dict[str, List[float]] = {}
+            for c, weight, norm in zip(counts, _FIELD_WEIGHTS, norms):
+                for term, tf in c.items():
+                    acc = weighted.setdefault(term, [0.0, 0.0])
+                    acc[0] += weight * tf / norm
+                    acc[1] += weight * tf
+            for term, (wtf, rtf) in weighted.items():
+                raw.setdefault(term, []).append((doc_pos, wtf, rtf))
+
+        self.vocab: Dict[str, int] = {}
+        self.offsets = array("q", [0])
+        self.post_docs = array("i")
+        self.post_impacts = array("f")
+        self.post_sentences = array("i")
+        self.tfidf_idf = array("f")
+        tfidf_weights = array("f")
+        for term_id, term in enumerate(sorted(raw)):
+            postings = raw[term]
+            df = len(postings)
+            idf = math.log(1.0 + (self.doc_count - df + 0.5) / (df + 0.5))
+            tfidf_idf = math.log((1.0 + self.doc_count) / (1.0 + df)) + 1.0
+            for doc_pos, wtf, rtf in postings:
+                self.post_docs.append(doc_pos)
+                self.post_impacts.append(idf * wtf * (k1 + 1.0) / (wtf + k1))
+                self.post_sentences.append(first_sentences[doc_pos].get(term, -1))
+                tfidf_weights.append((1.0 + math.log(rtf)) * tfidf_idf)
+            self.vocab[term] = term_id
+            self.tfidf_idf.append(tfidf_idf)
+            self.offsets.append(len(self.post_docs))
+
+        self.dictionary = TermDictionary(sorted(raw), self._doc_freqs())
+        self._np_docs = np.frombuffer(self.post_docs, dtype=np.int32)
+        weights = np.frombuffer(tfidf_weights, dtype=np.float32)
+        doc_norms = np.sqrt(np.bincount(self._np_docs, weights=weights.astype(np.float64) ** 2,
+                                        minlength=self.doc_count))
+        doc_norms[doc_norms == 0] = 1.0
+        self.tfidf_weights = (weights / doc_norms[self._np_docs]).astype(np.float32)
+
+    # Section names written by ``to_snapshot``, cast to these typecodes on load.
+    _ARRAY_SECTIONS = {"offsets": "q", "post_docs": "i", "post_impacts": "f",
+                       "post_sentences": "i", "tfidf_idf": "f"}
+    _RECORD_FIELDS = ("id", "title", "url", "content_norm", "fallback_snippet")
+
+    def to_snapshot(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Scalar metadata and flat buffers for an index snapshot file."""
+        sections: Dict[str, Any] = {name: getattr(self, name) for name in self._ARRAY_SECTIONS}
+        sections["tfidf_weights"] = self.tfidf_weights
+        # Term ids are assigned in sorted order, so the sorted terms are the vocab.
+        pack_into(sections, "terms", sorted(self.vocab, key=self.vocab.__getitem__))
+        for name, buffer in self.dictionary.to_snapshot().items():
+            sections[f"dictionary.{name}"] = buffer
+        for field in self._RECORD_FIELDS:
+            pack_into(sections, f"record.{field}", [getattr(r, field) for r in self.records])
+        bounds = array("i")
+        bound_offsets = array("q", [0])
+        for record in self.records:
+            bounds.extend(record.sentence_bounds)
+            bound_offsets.append(len(bounds))
+        sections["record.sentence_bounds"] = bounds
+        sections["record.sentence_bounds.offsets"] = bound_offsets
+        return {"k1": self.k1, "b": self.b, "doc_count": self.doc_count}, sections
+
+    @classmethod
+    def from_snapshot(cls, meta: Dict[str, Any], sections: Dict[str, memoryview]) -> "SearchIndex":
+        """Rebuild an index over snapshot buffers without copying or decoding them.
+
+        The vocabulary is looked up by bisection over the sorted terms and
+        document records are materialized on first use.
+        """
+        index = cls.__new__(cls)
+        index.k1 = meta["k1"]
+        index.b = meta["b"]
+        index.doc_count = meta["doc_count"]
+        for name, typecode in cls._ARRAY_SECTIONS.items():
+            setattr(index, name, sections[name].cast(typecode))
+        index.vocab = SortedKeyMap(unpack(sections, "terms"))
+        index.dictionary = TermDictionary.from_snapshot(unpack(sections, "terms"), index._doc_freqs(), {
+            name[len("dictionary."):]: view for name, view in sections.items() if name.startswith("dictionary.")
+        })
+        index._np_docs = np.frombuffer(index.post_docs, dtype=np.int32)
+        index.tfidf_weights = np.frombuffer(sections["tfidf_weights"], dtype=np.float32)
+
+        doc_id, title, url, content_norm, fallback = (
+            unpack(sections, f"record.{field}") for field in cls._RECORD_FIELDS)
+        bounds = sections["record.sentence_bounds"].cast("i")
+        bound_offsets = sections["record.sentence_bounds.offsets"].cast("q")
+
+        def record(pos: int) -> DocRecord:
+            return DocRecord.from_parts(doc_id[pos], title[pos], url[pos], content_norm[pos],
+                                        bounds[bound_offsets[pos]:bound_offsets[pos + 1]], fallback[pos])
+
+        index.records = LazyList(index.doc_count, record)
+        return index
+
+    def __len__(self) -> int:
+        return self.doc_count
+
+    def _postings(self, term_id: int, doc_range: Optional[Tuple[int, int]]) -> Tuple[int, int]:
+        """Bounds of the term's postings, narrowed to documents in ``doc_range`` when given."""
+        lo, hi = self.offsets[term_id], self.offsets[term_id + 1]
+        if doc_range is not None:
+            lo, hi = (bisect_left(self.post_docs, doc_range[0], lo, hi),
+                      bisect_left(self.post_docs, doc_range[1], lo, hi))
+        return lo, hi
+
+    def _doc_freqs(self) -> np.ndarray:
+        return np.diff(np.frombuffer(self.offsets, dtype=np.int64))
+
+    def expand(self, query: str) -> Dict[str, float]:
+        """Weigh the query's terms for scoring.
+
+        Known terms weigh their frequency in the query. A term missing from
+        the index is replaced by its prefix completions or, failing those, its
+        close spellings (see ``TermDictionary.expansions``), each weighing
+        less than 1.
+        """
+        weights: Dict[str, float] = {}
+        for term in tokenize(query):
+            if term in self.vocab:
+                weights[term] = weights.get(term, 0) + 1
+                continue
+            for expansion, weight in self.dictionary.expansions(term):
+                weights[expansion] = max(weights.get(expansion, 0.0), weight)
+        return weights
+
+    def _query_terms(self, query: Union[str, Mapping[str, float]]) -> Dict[int, float]:
+        """Map the query's known term ids to their weight; ``query`` may be pre-expanded."""
+        weights = self.expand(query) if isinstance(query, str) else query
+        term_ids: Dict[int, float] = {}
+        for term, weight in weights.items():
+            term_id = self.vocab.get(term)
+            if term_id is not None:
+                term_ids[term_id] = weight
+        return term_ids
+
+    def suggest(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Completions of the query's last word, or close spellings of it, as full query strings."""
+        terms = tokenize(query)
+        if not terms or not query.rstrip()[-1:].isalnum():
+            return []
+        head, last = terms[:-1], terms[-1]
+        matches = self.dictionary.complete(last, limit)
+        if not matches:
+            matches = [(term, df) for term, _distance, df
+                       in self.dictionary.similar(last, max_edit_distance(last), limit)]
+        return [{"text": " ".join(head + [term]), "documents": df} for term, df in matches]
+
+    def search(self, query: Union[str, Mapping[str, float]], limit: int = 10, mode: str = "bm25",
+               allowed: Optional[np.ndarray] = None) -> List[SearchHit]:
+        """Return up to ``limit`` hits, best first.
+
+        ``allowed`` is an optional per-document 0/1 table (see
+        ``FacetIndex.member_table``) that restricts which documents may match.
+        """
+        return self.search_matches(query, limit, mode, allowed)[0]
+
+    def search_matches(self, query: Union[str, Mapping[str, float]], limit: int = 10, mode: str = "bm25",
+                       allowed: Optional[np.ndarray] = None,
+                       doc_range: Optional[Tuple[int, int]] = None) -> Tuple[List[SearchHit], np.ndarray]:
+        """Like ``search``, also returning the positions of every matching document.
+
+        ``doc_range`` limits the search to document positions in [lo, hi).
+        """
+        if mode == "tfidf":
+            return self._search_tfidf(self.expand(query) if isinstance(query, str) else query, limit,
+                                      allowed, doc_range)
+        if mode != "bm25":
+            raise ValueError(f"Unknown search mode: {mode}")
+
+        scores: Dict[int, float] = {}
+        sentences: Dict[int, int] = {}
+        for term_id, weight in self._query_terms(query).items():
+            scale = min(weight, 1.0)  # expansions count for less; repeats do not count twice
+            lo, hi = self._postings(term_id, doc_range)
+            for doc_pos, impact, sentence in zip(self.post_docs[lo:hi], self.post_impacts[lo:hi],
+                                                 self.post_sentences[lo:hi]):
+                if allowed is not None and not allowed[doc_pos]:
+                    continue
+                scores[doc_pos] = scores.get(doc_pos, 0.0) + impact * scale
+                if sentence >= 0 and sentence < sentences.get(doc_pos, sentence + 1):
+                    sentences[doc_pos] = sentence
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        hits = [SearchHit(doc_pos, score, sentences.get(doc_pos, -1)) for doc_pos, score in top]
+        return hits, np.fromiter(scores, dtype=np.int64, count=len(scores))
+
+    def _search_tfidf(self, weights: Mapping[str, float], limit: int, allowed: Optional[np.ndarray],
+                      doc_range: Optional[Tuple[int, int]] = None) -> Tuple[List[SearchHit], np.ndarray]:
+        query_weights: Dict[int, float] = {}
+        query_norm = 0.0
+        for term, weight in weights.items():
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            query_weight = (1.0 + math.log(weight) if weight >= 1 else weight) * self.tfidf_idf[term_id]
+            query_norm += query_weight * query_weight
+            query_weights[term_id] = query_weight
+        if not query_weights:
+            return [], np.empty(0, dtype=np.int64)
+        query_norm = math.sqrt(query_norm)
+
+        # Sparse (CSC) matrix-vector product restricted to the query's columns.
+        slices = [slice(*self._postings(t, doc_range)) for t in query_weights]
+        docs = np.concatenate([self._np_docs[sl] for sl in slices])
+        values = np.concatenate([self.tfidf_weights[sl] * (w / query_norm)
+                                 for sl, w in zip(slices, query_weights.values())])
+        # Scores are accumulated per candidate, so the work and memory follow
+        # the matching postings rather than the corpus size.
+        candidates, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=values)
+        if allowed is not None:
+            keep = allowed[candidates].astype(bool)
+            candidates, scores = candidates[keep], scores[keep]
+        k = min(limit, len(candidates))
+        if k <= 0:
+            return [], candidates
+        best = np.argpartition(-scores, k - 1)[:k]
+        top = sorted(zip(candidates[best].tolist(), scores[best].tolist()), key=lambda item: (-item[1], item[0]))
+        hits = [SearchHit(d, score, self._first_sentence(d, query_weights)) for d, score in top]
+        return hits, candidates
+
+    def _first_sentence(self, doc_pos: int, term_ids: Dict[int, Any]) -> int:
+        best = -1
+        for term_id in term_ids:
+            lo, hi = self.offsets[term_id], self.offsets[term_id + 1]
+            i = bisect_left(self.post_docs, doc_pos, lo, hi)
+            if i < hi and self.post_docs[i] == doc_pos:
+                sentence = self.post_sentences[i]
+                if sentence >= 0 and (best < 0 or sentence < best):
+                    best = sentence
+        return best
+
+    def snippet(self, hit: SearchHit) -> str:
+        record = self.records[hit.doc_pos]
+        return record.fallback_snippet if hit.sentence < 0 else record.snippet(hit.sentence)
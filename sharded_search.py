@@ -0,0 +1,174 @@
+import heapq
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from search_index import SearchHit, SearchIndex
+
+logger = logging.getLogger("mcp-server")
+
+# ──────────────── Shard Processes ──────────────── #
+
+# State of a shard process: the index it inherited from the serving process
+# when forked (shared copy-on-write, or the same mapped snapshot) and the
+# range of document positions it scores.
+_shard_index: Optional[SearchIndex] = None
+_shard_range = (0, 0)
+
+def _init_shard(index: SearchIndex, lo: int, hi: int) -> None:
+    global _shard_index, _shard_range
+    _shard_index = index
+    _shard_range = (lo, hi)
+
+def _ping() -> int:
+    return _shard_range[1] - _shard_range[0]
+
+def _search_shard(query: Dict[str, float], limit: int, mode: str,
+                  allowed: Optional[np.ndarray]) -> Tuple[List[SearchHit], np.ndarray]:
+    return _shard_index.search_matches(query, limit, mode, allowed, _shard_range)
+
+# ──────────────── Scatter-Gather ──────────────── #
+
+class ShardedMatches(NamedTuple):
+    hits: List[SearchHit]
+    matches: np.ndarray
+    failed_shards: int
+    pending_shards: int = 0  # shards yet to answer; nonzero for provisional results
+
+class ShardedSearch:
+    """Scatter-gather search over contiguous shards of the corpus, one process per shard.
+
+    Every shard process scores its range of document positions in the index
+    it inherits when forked, so no shard builds or copies an index and shard
+    scores are the single-index scores: a query fans out to every shard, each
+    returns its local top ``limit``, and a heap merge keeps the global top
+    ``limit``. Shards that fail or miss the ``timeout`` deadline are left out
+    and counted in ``failed_shards``.
+
+    Shard processes are forked on first use in the serving process, never in
+    a preloading gunicorn master.
+    """
+
+    def __init__(self, index: SearchIndex, shards: int, timeout: float):
+        self.timeout = timeout
+        self._index = index
+        bounds = np.linspace(0, len(index), min(shards, max(len(index), 1)) + 1).astype(int).tolist()
+        self._ranges = list(zip(bounds[:-1], bounds[1:]))
+        # Passed to the forked process as-is; a fork context does not pickle them.
+        self._initargs = [(index, lo, hi) for lo, hi in self._ranges]
+        self._pools: List[ProcessPoolExecutor] = []
+        self._pid: Optional[int] = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.partial_results = 0
+
+    @property
+    def shard_count(self) -> int:
+        return len(self._ranges)
+
+    def _new_pool(self, shard: int) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(1, multiprocessing.get_context("fork"),
+                                   initializer=_init_shard, initargs=self._initargs[shard])
+
+    def start(self) -> None:
+        """Fork the shard processes and wait until every shard is up."""
+        with self._lock:
+            if self._closed or self._pid == os.getpid():
+                return
+            self._pools = [self._new_pool(shard) for shard in range(self.shard_count)]
+            self._pid = os.getpid()
+            pings = [pool.submit(_ping) for pool in self._pools]
+        wait(pings)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                for pool in self._pools:
+                    pool.shutdown(wait=False, cancel_futures=True)
+            self._pools = []
+            self._closed = True
+
+    def search(self, query: str, limit: int = 10, mode: str = "bm25",
+               allowed: Optional[np.ndarray] = None) -> ShardedMatches:
+        for result in self.search_progressive(query, limit, mode, allowed):
+            pass
+        return result
+
+    def search_progressive(self, query: str, limit: int = 10, mode: str = "bm25",
+                           allowed: Optional[np.ndarray] = None) -> Iterator[ShardedMatches]:
+        """Yield the merged top ``limit`` each time a shard answers; the last result is final."""
+        self.start()
+        # Expanded here, against the whole vocabulary, so every shard scores the same terms.
+        terms = self._index.expand(query)
+        pools = self._pools
+        futures = {}
+        failed = self.shard_count - len(pools)  # none left once closed by a reload
+        for shard, pool in enumerate(pools):
+            try:
+                futures[pool.submit(_search_shard, terms, limit, mode, allowed)] = shard
+            except RuntimeError as e:  # pool shut down by a reload, or broken
+                failed += 1
+                if isinstance(e, BrokenProcessPool):
+                    self._replace_broken(shard, pool)
+
+        shard_hits: List[List[SearchHit]] = []
+        shard_matches: List[np.ndarray] = []
+        pending = len(futures)
+        try:
+            for future in as_completed(futures, timeout=self.timeout):
+                pending -= 1
+                try:
+                    hits, matches = future.result()
+                except Exception as e:
+                    if isinstance(e, ValueError):
+                        raise  # bad query, same for every shard
+                    failed += 1
+                    logger.exception("Search shard %d failed", futures[future])
+                    if isinstance(e, BrokenProcessPool):
+                        self._replace_broken(futures[future], pools[futures[future]])
+                    continue
+                shard_hits.append(hits)
+                shard_matches.append(matches)
+                if pending:
+                    yield self._merge(shard_hits, shard_matches, limit, failed, pending)
+        except TimeoutError:
+            failed += pending
+        finally:
+            for future in futures:
+                future.cancel()  # no-op for finished shards
+
+        self.queries += 1
+        if failed:
+            self.partial_results += 1
+            logger.warning("Search returned partial results: %d of %d shards failed or timed out",
+                           failed, self.shard_count)
+        yield self._merge(shard_hits, shard_matches, limit, failed, 0)
+
+    @staticmethod
+    def _merge(shard_hits: List[List[SearchHit]], shard_matches: List[np.ndarray], limit: int,
+               failed: int, pending: int) -> ShardedMatches:
+        top = heapq.nlargest(limit, (hit for hits in shard_hits for hit in hits),
+                             key=lambda hit: (hit.score, -hit.doc_pos))
+        matches = np.concatenate(shard_matches) if shard_matches else np.empty(0, dtype=np.int64)
+        return ShardedMatches(top, matches, failed, pending)
+
+    def _replace_broken(self, shard: int, pool: ProcessPoolExecutor) -> None:
+        # A crashed shard process breaks its pool for good; start a fresh one.
+        with self._lock:
+            if self._pid == os.getpid() and shard < len(self._pools) and self._pools[shard] is pool:
+                self._pools[shard] = self._new_pool(shard)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "shards": self.shard_count,
+            "timeout": self.timeout,
+            "queries": self.queries,
+            "partial_results": self.partial_results
+        }
@@ -0,0 +1,121 @@
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from packed import SortedKeyMap, pack_into, unpack
+
+# Expansions stand in for a query term the index does not contain and score
+# below an exact match.
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHTS = {1: 0.6, 2: 0.4}
+MAX_EXPANSIONS = 5
+MIN_PREFIX_LENGTH = 3
+
+def max_edit_distance(term: str) -> int:
+    """Typos tolerated for a term of this length; short terms must match exactly."""
+    return 0 if len(term) < 5 else 1 if len(term) < 9 else 2
+
+def _trigrams(term: str) -> List[str]:
+    padded = f"${term}$"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance between ``a`` and ``b``, or ``limit + 1`` once it exceeds ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
+
+class TermDictionary:
+    """Sorted vocabulary with a character-trigram index, for prefix and typo-tolerant lookup.
+
+    Prefix completion is a bisection over the sorted terms. Fuzzy lookup
+    collects the terms sharing trigrams with the query term; one edit changes
+    at most three trigrams of the padded term, which bounds how many a
+    candidate must share, and the survivors are checked with a bounded edit
+    distance. Neither scans the vocabulary.
+    """
+
+    def __init__(self, terms: Sequence[str], doc_freqs: np.ndarray):
+        self.terms = terms
+        self.doc_freqs = doc_freqs
+        grams: Dict[str, List[int]] = {}
+        for term_id, term in enumerate(terms):
+            for gram in set(_trigrams(term)):
+                grams.setdefault(gram, []).append(term_id)
+        self.gram_offsets = array("q", [0])
+        self.gram_terms = array("i")
+        for gram in sorted(grams):
+            self.gram_terms.extend(grams[gram])
+            self.gram_offsets.append(len(self.gram_terms))
+        self.gram_ids = SortedKeyMap(sorted(grams))
+        self._np_gram_terms = np.frombuffer(self.gram_terms, dtype=np.int32)
+
+    def to_snapshot(self) -> Dict[str, Any]:
+        sections: Dict[str, Any] = {"gram_offsets": self.gram_offsets, "gram_terms": self.gram_terms}
+        pack_into(sections, "grams", list(self.gram_ids))
+        return sections
+
+    @classmethod
+    def from_snapshot(cls, terms: Sequence[str], doc_freqs: np.ndarray,
+                      sections: Dict[str, memoryview]) -> "TermDictionary":
+        dictionary = cls.__new__(cls)
+        dictionary.terms = terms
+        dictionary.doc_freqs = doc_freqs
+        dictionary.gram_offsets = sections["gram_offsets"].cast("q")
+        dictionary.gram_terms = sections["gram_terms"].cast("i")
+        dictionary.gram_ids = SortedKeyMap(unpack(sections, "grams"))
+        dictionary._np_gram_terms = np.frombuffer(dictionary.gram_terms, dtype=np.int32)
+        return dictionary
+
+    def complete(self, prefix: str, limit: int = MAX_EXPANSIONS) -> List[Tuple[str, int]]:
+        """Up to ``limit`` terms starting with ``prefix`` as (term, doc frequency), most frequent first."""
+        lo = bisect_left(self.terms, prefix)
+        hi = bisect_left(self.terms, prefix + "\uffff", lo)
+        if lo >= hi:
+            return []
+        freqs = self.doc_freqs[lo:hi]
+        top = np.argsort(-freqs, kind="stable")[:limit]
+        return [(self.terms[lo + i], int(freqs[i])) for i in top.tolist()]
+
+    def similar(self, term: str, max_distance: int, limit: int = MAX_EXPANSIONS) -> List[Tuple[str, int, int]]:
+        """Up to ``limit`` terms within ``max_distance`` edits as (term, distance, doc frequency).
+
+        Closest first, then most frequent; ``term`` itself is excluded.
+        """
+        grams = set(_trigrams(term))
+        required = len(grams) - 3 * max_distance
+        if max_distance <= 0 or required <= 0:
+            return []
+        gram_ids = [gram_id for gram_id in map(self.gram_ids.get, grams) if gram_id is not None]
+        if len(gram_ids) < required:
+            return []
+        candidates, shared = np.unique(np.concatenate([
+            self._np_gram_terms[self.gram_offsets[g]:self.gram_offsets[g + 1]] for g in gram_ids
+        ]), return_counts=True)
+        matches = []
+        for term_id in candidates[shared >= required].tolist():
+            candidate = self.terms[term_id]
+            distance = edit_distance(term, candidate, max_distance)
+            if 0 < distance <= max_distance:
+                matches.append((distance, -int(self.doc_freqs[term_id]), candidate))
+        matches.sort()
+        return [(candidate, distance, -neg_df) for distance, neg_df, candidate in matches[:limit]]
+
+    def expansions(self, term: str) -> List[Tuple[str, float]]:
+        """Weighted stand-ins for a term missing from the index: completions, else close spellings."""
+        if len(term) >= MIN_PREFIX_LENGTH:
+            completions = self.complete(term)
+            if completions:
+                return [(completion, PREFIX_WEIGHT) for completion, _df in completions]
+        return [(candidate, FUZZY_WEIGHTS[distance])
+                for candidate, distance, _df in self.similar(term, max_edit_distance(term))]
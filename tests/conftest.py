@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set before main or config is imported: build the built-in corpus in-process
+# and keep the test output quiet.
+os.environ["MCP_INDEX_SNAPSHOT"] = ""
+os.environ["MCP_LOG_REQUESTS"] = "0"
+
+from bench.synthetic_corpus import generate
+
+@pytest.fixture(scope="session")
+def synthetic_docs():
+    return list(generate(600, seed=1))
+
+@pytest.fixture(scope="session")
+def corpus_path(tmp_path_factory, synthetic_docs):
+    import json
+    path = tmp_path_factory.mktemp("corpus") / "kb.jsonl"
+    path.write_text("".join(json.dumps(doc) + "\n" for doc in synthetic_docs), encoding="utf-8")
+    return str(path)
+
+@pytest.fixture(scope="session")
+def queries(synthetic_docs):
+    # Words taken from the documents themselves, so every query matches something.
+    return [" ".join(doc["title"].lower().split()[:2]) for doc in synthetic_docs[:40:4]] + ["zzzz"]
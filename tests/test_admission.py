@@ -0,0 +1,159 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, Overloaded, RateLimiter
+
+# ──────────────── AdmissionController ──────────────── #
+
+def test_admits_up_to_the_limit_then_queues_and_hands_over():
+    async def run():
+        admission = AdmissionController(max_concurrent=1, max_queue=2, queue_timeout=5.0)
+        await admission.acquire()
+        first = asyncio.ensure_future(admission.acquire())
+        second = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0)
+        assert admission.waiting == 2 and not first.done()
+
+        admission.release()  # the slot goes to the first waiter, in order
+        await first
+        assert not second.done() and admission.active == 1
+        admission.release()
+        await second
+        admission.release()
+        assert admission.active == 0 and admission.waiting == 0
+        assert admission.admitted == 3 and admission.queued == 2
+    asyncio.run(run())
+
+def test_sheds_when_the_queue_is_full():
+    async def run():
+        admission = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5.0)
+        await admission.acquire()
+        waiter = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as e:
+            await admission.acquire()
+        assert e.value.reason == "queue_full" and admission.rejected == 1
+        waiter.cancel()
+    asyncio.run(run())
+
+def test_queue_timeout():
+    async def run():
+        admission = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=0.01)
+        await admission.acquire()
+        with pytest.raises(Overloaded) as e:
+            await admission.acquire()
+        assert e.value.reason == "queue_timeout" and e.value.retry_after >= 1.0
+        assert admission.timed_out == 1 and admission.waiting == 0
+        admission.release()
+        assert admission.active == 0
+    asyncio.run(run())
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        admission = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=5.0)
+        await admission.acquire()
+        waiter = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert admission.waiting == 0
+        admission.release()
+        assert admission.active == 0
+    asyncio.run(run())
+
+def test_cancelled_waiter_passes_on_a_slot_it_was_handed():
+    async def run():
+        admission = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=5.0)
+        await admission.acquire()
+        cancelled = asyncio.ensure_future(admission.acquire())
+        next_in_line = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0)
+        admission.release()  # hands the slot to ``cancelled``...
+        cancelled.cancel()   # ...which goes away before it runs
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        await asyncio.wait_for(next_in_line, 1.0)
+        admission.release()
+        assert admission.active == 0 and admission.waiting == 0
+    asyncio.run(run())
+
+def test_zero_limit_admits_everything():
+    async def run():
+        admission = AdmissionController(max_concurrent=0, max_queue=0, queue_timeout=0.0)
+        for _ in range(100):
+            await admission.acquire()
+        admission.release()
+        assert admission.active == 0
+    asyncio.run(run())
+
+# ──────────────── RateLimiter ──────────────── #
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_bucket_drains_and_refills():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=2.0, burst=4.0, costs={}, clock=clock)
+    for _ in range(4):
+        limiter.take("a", 1.0)
+    with pytest.raises(Overloaded) as e:
+        limiter.take("a", 1.0)
+    assert e.value.reason == "rate_limited" and e.value.retry_after == pytest.approx(0.5)
+    limiter.take("b", 1.0)  # other clients have their own bucket
+
+    clock.now += 0.5
+    limiter.take("a", 1.0)
+    clock.now += 60.0  # refills up to burst, no further
+    for _ in range(4):
+        limiter.take("a", 1.0)
+    with pytest.raises(Overloaded):
+        limiter.take("a", 1.0)
+    assert limiter.allowed == 10 and limiter.limited == 2
+
+def test_costs_and_budget():
+    limiter = RateLimiter(rate=1.0, burst=5.0, costs={"tools/call": 2.0, "tools/call:search": 4.0,
+                                                      "notifications/initialized": 0.0}, clock=FakeClock())
+    assert limiter.cost("tools/call", "search") == 4.0
+    assert limiter.cost("tools/call", "fetch") == 2.0
+    assert limiter.cost("resources/list") == 1.0
+    limiter.take("a", 4.0)
+    with pytest.raises(Overloaded) as e:
+        limiter.take("a", 4.0)
+    assert e.value.retry_after == pytest.approx(3.0)
+    for _ in range(10):
+        limiter.take("a", limiter.cost("notifications/initialized"))
+    with pytest.raises(Overloaded) as e:
+        limiter.take("a", 6.0)
+    assert e.value.reason == "over_budget" and limiter.over_budget == 1
+
+def test_disabled_limiter_allows_everything():
+    limiter = RateLimiter(rate=0.0, burst=1.0, costs={}, clock=FakeClock())
+    for _ in range(10):
+        limiter.take("a", 1.0)
+    assert not limiter.enabled and limiter.stats()["clients"] == 0
+
+def test_slot_collision_resets_the_bucket():
+    limiter = RateLimiter(rate=1.0, burst=2.0, costs={}, max_clients=1, clock=FakeClock())
+    limiter.take("a", 2.0)
+    limiter.take("b", 2.0)  # takes over the only slot with a full bucket
+    limiter.take("a", 2.0)
+    assert limiter.stats()["clients"] == 1
+
+def test_shared_buckets(tmp_path):
+    clock = FakeClock()
+    path = str(tmp_path / "ratelimit")
+    # Two limiters over one file stand in for two gunicorn workers.
+    first, second = (RateLimiter(rate=1.0, burst=3.0, costs={}, clock=clock, shared_path=path) for _ in range(2))
+    first.take("a", 2.0)
+    second.take("a", 1.0)
+    with pytest.raises(Overloaded):
+        first.take("a", 1.0)
+    clock.now += 1.0
+    second.take("a", 1.0)
+    assert first.stats()["shared"] and second.stats()["clients"] == 1
@@ -0,0 +1,62 @@
+import pytest
+
+from corpus import CorpusSnapshot, build_snapshot, source_digest
+from index_snapshot import SnapshotError, load_snapshot, write_snapshot
+from search_index import SEARCH_MODES
+
+@pytest.fixture(scope="module")
+def built(corpus_path):
+    return build_snapshot(corpus_path)
+
+@pytest.fixture(scope="module")
+def loaded(built, corpus_path, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("snapshot") / "index.snapshot")
+    write_snapshot(path, built.store, built.search_index, built.facet_index, built.source, source_digest(corpus_path))
+    return CorpusSnapshot(*load_snapshot(path, source_digest(corpus_path)), built.source)
+
+def test_round_trip_keeps_documents(built, loaded):
+    assert loaded.version == built.version
+    assert len(loaded.store) == len(built.store)
+    for pos in range(0, len(built.store), 37):
+        doc = built.store.at(pos)
+        assert loaded.store.at(pos) == doc
+        assert loaded.store.fetch(doc["id"]) == built.store.fetch(doc["id"])
+        assert loaded.store.resource_entry(pos) == built.store.resource_entry(pos)
+    assert loaded.store.page(None, 50) == built.store.page(None, 50)
+
+@pytest.mark.parametrize("mode", SEARCH_MODES)
+def test_round_trip_keeps_search_results(built, loaded, queries, mode):
+    for query in queries:
+        hits = built.search_index.search(query, 20, mode)
+        assert loaded.search_index.search(query, 20, mode) == hits
+        assert [loaded.search_index.snippet(hit) for hit in hits] == [built.search_index.snippet(hit) for hit in hits]
+        assert loaded.search_index.suggest(query) == built.search_index.suggest(query)
+
+def test_round_trip_keeps_facets(built, loaded):
+    assert loaded.categories == built.categories
+    assert loaded.facet_index.counts() == built.facet_index.counts()
+    filters = {"category": [built.categories[0]]}
+    mask = built.facet_index.mask(filters)
+    assert loaded.facet_index.mask(filters) == mask
+    assert loaded.facet_index.counts(mask) == built.facet_index.counts(mask)
+    allowed = built.facet_index.member_table(mask)
+    assert (loaded.facet_index.member_table(mask) == allowed).all()
+    hits = built.search_index.search("payment", 10, allowed=allowed)
+    assert loaded.search_index.search("payment", 10, allowed=allowed) == hits
+
+def test_build_snapshot_uses_matching_snapshot(built, corpus_path, tmp_path):
+    path = str(tmp_path / "index.snapshot")
+    write_snapshot(path, built.store, built.search_index, built.facet_index, built.source, source_digest(corpus_path))
+    assert build_snapshot(corpus_path, path).version == built.version
+
+def test_stale_snapshot_is_rejected(built, corpus_path, tmp_path):
+    path = str(tmp_path / "index.snapshot")
+    write_snapshot(path, built.store, built.search_index, built.facet_index, built.source, "stale")
+    with pytest.raises(SnapshotError):
+        load_snapshot(path, source_digest(corpus_path))
+    # build_snapshot falls back to building in-process
+    assert build_snapshot(corpus_path, path).version == built.version
+
+def test_missing_snapshot(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_snapshot(str(tmp_path / "missing.snapshot"), "digest")
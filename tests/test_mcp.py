@@ -0,0 +1,134 @@
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+
+import config
+import main
+from compression import ENCODINGS, negotiate
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+def rpc(client, method, params=None, req_id=1, **kwargs):
+    body = {"jsonrpc": "2.0", "id": req_id, "method": method}
+    if params is not None:
+        body["params"] = params
+    return client.post("/mcp", json=body, **kwargs)
+
+def call(client, tool, arguments, req_id=1):
+    return rpc(client, "tools/call", {"name": tool, "arguments": arguments}, req_id).json()
+
+# ──────────────── JSON-RPC ──────────────── #
+
+def test_unknown_method_and_tool(client):
+    response = rpc(client, "no/such/method", req_id=7)
+    assert response.status_code == 200
+    assert response.json()["id"] == 7 and response.json()["error"]["code"] == -32601
+    error = call(client, "no_such_tool", {}, req_id="x")
+    assert error["id"] == "x" and error["error"]["code"] == -32601
+
+def test_invalid_params(client):
+    for tool, arguments in [("fetch", {"id": 123}), ("search", {"query": " "}),
+                            ("search", {"query": "card", "limit": 0}), ("search", {"query": "card", "mode": "x"}),
+                            ("suggest", {"query": 5}), ("suggest", {"query": "pay", "limit": True})]:
+        assert call(client, tool, arguments)["error"]["code"] == -32602, (tool, arguments)
+
+def test_notifications_get_202(client):
+    response = client.post("/mcp", json={"jsonrpc": "2.0", "method": "notifications/initialized"})
+    assert response.status_code == 202 and response.content == b""
+    response = client.post("/mcp", json=[{"jsonrpc": "2.0", "method": "notifications/initialized"}])
+    assert response.status_code == 202 and response.content == b""
+
+def test_batch(client):
+    response = client.post("/mcp", json=[
+        {"jsonrpc": "2.0", "id": 1, "method": "tools/list"},
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        {"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {"name": "search", "arguments": {"query": "card"}}},
+        {"jsonrpc": "2.0", "id": 3, "method": "nope"}
+    ])
+    assert [entry["id"] for entry in response.json()] == [1, 2, 3]
+    assert response.json()[2]["error"]["code"] == -32601
+
+def test_fetch_and_search(client):
+    doc_id = main.CORPUS.current.store.at(0)["id"]
+    fetched = call(client, "fetch", {"id": doc_id})["result"]
+    assert doc_id in fetched["content"][0]["text"]
+    missing = call(client, "fetch", {"id": "missing-doc"})["result"]
+    assert "Document not found" in missing["content"][0]["text"]
+    assert call(client, "search", {"query": "payment", "limit": 3})["result"]["content"]
+
+# ──────────────── resources/list ──────────────── #
+
+def test_resources_list_pages_through_every_document(client, monkeypatch):
+    monkeypatch.setattr(config, "RESOURCES_PAGE_SIZE", 10)
+    store = main.CORPUS.current.store
+    uris, cursor, pages = [], None, 0
+    while True:
+        result = rpc(client, "resources/list", {"cursor": cursor} if cursor else {}).json()["result"]
+        assert len(result["resources"]) <= 10
+        uris += [resource["uri"] for resource in result["resources"]]
+        pages += 1
+        cursor = result.get("nextCursor")
+        if not cursor:
+            break
+    assert pages == -(-len(store) // 10)
+    assert len(uris) == len(set(uris)) == len(store)
+    assert uris == sorted(uris)
+
+def test_resources_list_rejects_bad_cursor(client):
+    assert rpc(client, "resources/list", {"cursor": "!!not-base64"}).json()["error"]["code"] == -32602
+
+# ──────────────── Compression and conditional requests ──────────────── #
+
+def test_negotiate():
+    assert negotiate("") == "identity"
+    assert negotiate("gzip;q=0, identity") == "identity"
+    assert negotiate("gzip, deflate") == "gzip"
+    assert negotiate("*") == ENCODINGS[0]
+
+def test_listing_etag_and_304(client):
+    response = client.get("/browse", headers={"Accept-Encoding": "gzip"})
+    etag = response.headers["etag"]
+    assert response.status_code == 200 and response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+
+    response = client.get("/browse", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status_code == 304 and response.content == b""
+    assert response.headers["etag"] == etag
+    # Another encoding is another representation.
+    response = client.get("/browse", headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+
+def test_listing_bodies_match_across_encodings_and_cache(client):
+    identity = client.get("/browse", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    hits = main.LISTING_CACHE.hits
+    for encoding in ENCODINGS:
+        for _ in range(2):  # streamed, then served from the listing cache
+            response = client.get("/browse", headers={"Accept-Encoding": encoding})
+            assert response.headers["content-encoding"] == encoding
+            assert response.content == identity.content
+    assert main.LISTING_CACHE.hits > hits
+
+def test_gzip_listing_bytes(client):
+    with client.stream("GET", "/research_resources", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+    plain = client.get("/research_resources", headers={"Accept-Encoding": "identity"}).content
+    assert gzip.decompress(raw) == plain
+
+def test_small_listing_is_not_compressed(client):
+    for _ in range(2):
+        response = client.get("/browse", params={"category": "no such category"}, headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200 and len(response.content) < config.COMPRESSION_MIN_SIZE
+        assert "content-encoding" not in response.headers
+        assert response.json()["total_items"] == 0
+
+def test_mcp_responses_compressed_above_min_size(client):
+    response = rpc(client, "tools/list", headers={"Accept-Encoding": "gzip"})
+    assert len(response.content) >= config.COMPRESSION_MIN_SIZE
+    assert response.headers["content-encoding"] == "gzip"
+    response = rpc(client, "initialize", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
@@ -0,0 +1,16 @@
+import pytest
+
+from packed import SortedKeyMap
+
+def test_sorted_key_map():
+    ranks = SortedKeyMap(["apple", "banana", "cherry"])
+    assert ranks.get("banana") == 1 and ranks["cherry"] == 2
+    assert ranks.get("durian") is None and "durian" not in ranks
+    values = SortedKeyMap(["a", "b"], [10, 20])
+    assert values.get("b") == 20 and list(values) == ["a", "b"]
+
+@pytest.mark.parametrize("key", [123, None, 1.5, ["a"]])
+def test_non_string_keys_are_missing(key):
+    ranks = SortedKeyMap(["apple", "banana"])
+    assert ranks.get(key, -1) == -1
+    assert key not in ranks
@@ -0,0 +1,64 @@
+from result_cache import ResultCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_lru_eviction():
+    cache = ResultCache(2)
+    cache.put("a", "v1", 1)
+    cache.put("b", "v1", 2)
+    assert cache.get("a", "v1") == 1  # now most recently used
+    cache.put("c", "v1", 3)
+    assert cache.get("b", "v1") is None
+    assert cache.get("a", "v1") == 1 and cache.get("c", "v1") == 3
+    assert cache.evictions == 1
+
+def test_entries_are_per_version():
+    cache = ResultCache(8)
+    cache.put("a", "v1", 1)
+    assert cache.get("a", "v2") is None
+    cache.put("a", "v2", 2)
+    assert cache.get("a", "v1") == 1 and cache.get("a", "v2") == 2
+
+def test_retain_drops_other_versions_and_ignores_late_puts():
+    cache = ResultCache(8)
+    cache.put("a", "v1", 1)
+    cache.put("b", "v2", 2)
+    cache.retain("v2")
+    assert cache.get("a", "v1") is None and cache.get("b", "v2") == 2
+    assert cache.invalidations == 1
+    cache.put("a", "v1", 1)  # a request still reading the old snapshot
+    assert cache.get("a", "v1") is None and len(cache) == 1
+
+def test_ttl():
+    clock = FakeClock()
+    cache = ResultCache(8, ttl=10.0, clock=clock)
+    cache.put("a", "v1", 1)
+    clock.now = 9.9
+    assert cache.get("a", "v1") == 1
+    clock.now = 10.0
+    assert cache.get("a", "v1") is None
+    assert cache.expirations == 1 and len(cache) == 0
+
+def test_maxbytes():
+    cache = ResultCache(8, maxbytes=10)
+    cache.put("a", "v1", b"1234")
+    cache.put("b", "v1", b"5678")
+    cache.put("c", "v1", b"90ab")  # evicts the oldest to stay within 10 bytes
+    assert cache.get("a", "v1") is None
+    assert cache.get("b", "v1") == b"5678" and cache.get("c", "v1") == b"90ab"
+    cache.put("big", "v1", b"x" * 11)  # never kept, and evicts nothing
+    assert cache.get("big", "v1") is None and len(cache) == 2
+    cache.put("b", "v1", b"56")  # replacing an entry accounts for the old value
+    assert cache.stats()["bytes"] == 6
+    cache.clear()
+    assert cache.stats()["bytes"] == 0 and len(cache) == 0
+
+def test_disabled():
+    cache = ResultCache(0)
+    cache.put("a", "v1", 1)
+    assert cache.get("a", "v1") is None and len(cache) == 0
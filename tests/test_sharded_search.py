@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from corpus import build_snapshot
+from search_index import SEARCH_MODES
+from sharded_search import ShardedSearch
+
+@pytest.fixture(scope="module")
+def snapshot(corpus_path):
+    return build_snapshot(corpus_path)
+
+@pytest.fixture(scope="module")
+def shards(snapshot):
+    sharded = ShardedSearch(snapshot.search_index, 3, timeout=30.0)
+    yield sharded
+    sharded.close()
+
+def assert_same_results(sharded, single):
+    hits, matches = single
+    assert [hit.doc_pos for hit in sharded.hits] == [hit.doc_pos for hit in hits]
+    assert [hit.score for hit in sharded.hits] == pytest.approx([hit.score for hit in hits])
+    assert [hit.sentence for hit in sharded.hits] == [hit.sentence for hit in hits]
+    assert sorted(sharded.matches.tolist()) == sorted(matches.tolist())
+    assert sharded.failed_shards == 0
+
+@pytest.mark.parametrize("mode", SEARCH_MODES)
+def test_sharded_matches_single_index(snapshot, shards, queries, mode):
+    assert shards.shard_count == 3
+    for query in queries:
+        assert_same_results(shards.search(query, 15, mode), snapshot.search_index.search_matches(query, 15, mode))
+
+def test_sharded_respects_allowed(snapshot, shards, queries):
+    allowed = snapshot.facet_index.member_table(snapshot.facet_index.mask({"category": [snapshot.categories[0]]}))
+    for query in queries:
+        result = shards.search(query, 10, allowed=allowed)
+        assert_same_results(result, snapshot.search_index.search_matches(query, 10, allowed=allowed))
+        assert all(allowed[hit.doc_pos] for hit in result.hits)
+
+def test_progressive_results_end_with_the_final_ranking(snapshot, shards, queries):
+    results = list(shards.search_progressive(queries[0], 10))
+    assert [result.pending_shards for result in results] == list(range(len(results) - 1, -1, -1))
+    assert_same_results(results[-1], snapshot.search_index.search_matches(queries[0], 10))
+
+def test_closed_shards_count_as_failed(snapshot):
+    sharded = ShardedSearch(snapshot.search_index, 2, timeout=30.0)
+    sharded.close()
+    result = sharded.search("payment", 10)
+    assert result.hits == [] and result.failed_shards == 2
+    assert isinstance(result.matches, np.ndarray) and len(result.matches) == 0